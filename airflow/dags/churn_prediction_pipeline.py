@@ -3,8 +3,9 @@ Churn Prediction Pipeline DAG
 ====================================================
 """
 
+import inspect
+import json
 import os
-import subprocess
 import sys
 from datetime import datetime, timedelta
 
@@ -15,6 +16,62 @@ from airflow.operators.python import PythonOperator
 PROJECT_ROOT = os.path.dirname(os.path.dirname(
     os.path.dirname(os.path.abspath(__file__))))
 
+# Tasks import the pipeline modules in-process; the LocalExecutor already
+# runs each task in its own worker process.
+SRC_DIR = os.path.join(PROJECT_ROOT, 'src')
+if SRC_DIR not in sys.path:
+    sys.path.append(SRC_DIR)
+
+# Task environment, built once per DAG-file parse rather than on every task call.
+# MPLBACKEND keeps the EDA plots headless; PYTHONFAULTHANDLER carries over to
+# the git/DVC subprocesses spawned by the versioning step.
+_TASK_ENV = {
+    'MPLBACKEND': 'Agg',
+    'PYTHONFAULTHANDLER': 'true',
+}
+for _env_key, _env_value in _TASK_ENV.items():
+    os.environ.setdefault(_env_key, _env_value)
+
+# Resource pools (created by airflow/setup_airflow.py): memory-heavy steps share
+# a small pool so they never run together, everything else uses the light pool
+HEAVY_POOL = 'heavy_pool'
+CPU_POOL = 'cpu_pool'
+
+# Per-task execution timeouts in seconds. Override without a deploy through the
+# env-backed Airflow Variable AIRFLOW_VAR_CHURN_TASK_TIMEOUTS (JSON, e.g.
+# {"model_building": 3600}). It is read from the environment, not Variable.get,
+# so parsing the DAG file never queries the metadata DB.
+DEFAULT_TIMEOUT_SEC = 300
+TASK_TIMEOUTS = {
+    'data_ingestion': 120,
+    'data_transformation': 900,
+    'model_building': 1800,
+}
+
+
+def _timeout_overrides():
+    """Timeout overrides from the environment; a malformed value is ignored, never fatal"""
+    raw = os.environ.get('AIRFLOW_VAR_CHURN_TASK_TIMEOUTS')
+    if not raw:
+        return {}
+    try:
+        overrides = json.loads(raw)
+        if not isinstance(overrides, dict):
+            raise ValueError("expected a JSON object")
+        return {task_id: int(seconds) for task_id, seconds in overrides.items()}
+    except (TypeError, ValueError) as e:
+        print(f"Ignoring invalid AIRFLOW_VAR_CHURN_TASK_TIMEOUTS: {str(e)}")
+        return {}
+
+
+TASK_TIMEOUTS.update(_timeout_overrides())
+
+
+def task_timeout(task_id):
+    """Execution timeout for a task"""
+    return timedelta(seconds=int(TASK_TIMEOUTS.get(task_id, DEFAULT_TIMEOUT_SEC)))
+
+
 # DAG configuration
 dag = DAG(
     'churn_prediction_pipeline',
@@ -26,195 +83,240 @@ dag = DAG(
         'email_on_retry': False,
         'retries': 1,
         'retry_delay': timedelta(minutes=5),
-        'catchup': False,
     },
     description='Complete churn prediction pipeline',
     schedule=timedelta(hours=6),
+    # DAG-level settings (catchup has no effect inside default_args)
+    catchup=False,
     max_active_runs=1,
-    tags=['churn', 'ml', 'pipeline', 'sequential'],
+    dagrun_timeout=timedelta(hours=2),
+    # Enough slots for the widest fan-out (storage + validation branches)
+    max_active_tasks=4,
+    tags=['churn', 'ml', 'pipeline'],
 )
 
 
-def run_python_script(script_code, task_name, **context):
-    """Helper function to run Python scripts safely"""
-    print(f"Starting {task_name}...")
+# Environment variables that change what a cached step produces
+CACHE_ENV_VARS = ('FEATURES_PATH', 'MLFLOW_LOG_MODEL', 'MLFLOW_TRACKING_URI')
 
-    # Set environment variables
-    env = os.environ.copy()
-    env['PYTHONFAULTHANDLER'] = 'true'
-    env['MPLBACKEND'] = 'Agg'
-    env['PYTHONPATH'] = f"{PROJECT_ROOT}:{PROJECT_ROOT}/src"
 
-    try:
-        result = subprocess.run(
-            [sys.executable, '-c', script_code],
-            cwd=PROJECT_ROOT,
-            env=env,
-            capture_output=True,
-            text=True,
-            timeout=300,  # 5 minutes per task
-            check=False
-        )
+def run_pipeline_task(task_callable, task_name, cache_inputs=None, cache_outputs=None):
+    """Run a pipeline step in-process inside the Airflow worker
 
-        if result.returncode == 0:
-            print(f"{task_name} completed successfully!")
-            print("Output:", result.stdout[-500:])  # Last 500 chars
-            return {"status": "success", "output": result.stdout}
-        else:
-            print(f"{task_name} failed!")
-            print("Error:", result.stderr[-500:])
-            raise RuntimeError(f"{task_name} failed: {result.stderr}")
+    cache_inputs, when given, returns (input_files, module_name) for the step.
+    The step is skipped if a result is cached for the same input bytes and code
+    (the task callable, the step module and every local module it imports) and
+    CACHE_ENV_VARS, and the files cache_outputs(result) listed still exist. If
+    the key cannot be computed the step simply runs uncached.
+    """
+    print(f"Starting {task_name}...")
+
+    # Pipeline modules resolve data/, logs/ and reports/ relative to the project root
+    os.chdir(PROJECT_ROOT)
+
+    cache = cache_key = None
+    if cache_inputs is not None:
+        from stage_cache import StageCache, local_module_files
+
+        try:
+            input_files, module_name = cache_inputs()
+            params = {
+                'task_source': inspect.getsource(task_callable),
+                'env': {name: os.environ.get(name) for name in CACHE_ENV_VARS},
+            }
+            cache = StageCache()
+            cache_key = cache.make_key(
+                task_name, input_files, local_module_files(module_name, SRC_DIR), params)
+        except Exception as e:
+            print(f"{task_name} cache key unavailable, running uncached: {str(e)}")
+            cache = cache_key = None
+        if cache is not None and cache.has(cache_key):
+            print(f"{task_name} inputs unchanged, reusing cached result")
+            return cache.load(cache_key)
 
-    except subprocess.TimeoutExpired:
-        print(f"{task_name} timed out!")
-        raise RuntimeError(f"{task_name} timed out after 5 minutes")
+    try:
+        result = task_callable()
     except Exception as e:
-        print(f"{task_name} crashed: {str(e)}")
+        print(f"{task_name} failed: {str(e)}")
         raise
+    finally:
+        # Pipeline loggers write from background threads, and the task runner
+        # leaves through os._exit (no atexit), so drain them before returning
+        from utils.logger import flush_logs
+        flush_logs()
+
+    print(f"{task_name} completed successfully!")
+    task_result = {"status": "success", "result": str(result)}
+    if cache is not None:
+        try:
+            outputs = cache_outputs(result) if cache_outputs is not None else []
+        except Exception as e:
+            # Without its outputs an entry could not be validated later; do not store it
+            print(f"{task_name} outputs unavailable, result not cached: {str(e)}")
+        else:
+            cache.store(cache_key, task_result, outputs)
+    return task_result
 
 
 # Data Ingestion
 def data_ingestion(**context):
     """Data Ingestion"""
-    script = """
-import sys
-sys.path.append('src')
-from data_ingestion import DataIngestionPipeline
+    def run():
+        from data_ingestion import DataIngestionPipeline
 
-print("Running data ingestion...")
-pipeline = DataIngestionPipeline()
-result = pipeline.run_ingestion()
-print(f"Data Ingestion Result: {result}")
-"""
-    return run_python_script(script, "Data Ingestion", **context)
+        print("Running data ingestion...")
+        pipeline = DataIngestionPipeline()
+        result = pipeline.run_ingestion()
+        print(f"Data Ingestion Result: {result}")
+        return result
+
+    return run_pipeline_task(run, "Data Ingestion")
 
 
 # Raw Data Storage
 def raw_data_storage(**context):
     """Raw Data Storage"""
-    script = """
-import sys
-sys.path.append('src')
-from raw_data_storage import RawDataStorage
+    def run():
+        from raw_data_storage import RawDataStorage
 
-print("Running raw data storage...")
-storage = RawDataStorage()
-result = storage.create_data_catalog()
-print(f"Raw Data Storage Result: {result}")
-"""
-    return run_python_script(script, "Raw Data Storage", **context)
+        print("Running raw data storage...")
+        storage = RawDataStorage()
+        result = storage.create_data_catalog()
+        print(f"Raw Data Storage Result: {result}")
+        return result
+
+    return run_pipeline_task(run, "Raw Data Storage")
 
 
 # Data Validation
 def data_validation(**context):
     """Data Validation"""
-    script = """
-import sys
-sys.path.append('src')
-from data_validation import DataValidator
+    def run():
+        from data_validation import DataValidator
 
-print("Running data validation...")
-validator = DataValidator()
-result = validator.run_validation()
-print(f"Data Validation Result: {result}")
-"""
-    return run_python_script(script, "Data Validation", **context)
+        print("Running data validation...")
+        validator = DataValidator()
+        result = validator.run_validation()
+        print(f"Data Validation Result: {result}")
+        return result
+
+    return run_pipeline_task(run, "Data Validation")
 
 
 # Data Preparation
 def data_preparation(**context):
     """Data Preparation"""
-    script = """
-import sys
-import os
-sys.path.append('src')
-
-print("Running data preparation...")
-os.environ['MPLBACKEND'] = 'Agg'
-os.environ['PYTHONFAULTHANDLER'] = 'true'
-
-try:
-    from data_preparation_safe import SafeDataPreparationPipeline
-    pipeline = SafeDataPreparationPipeline()
-    result = pipeline.run_preparation_auto()
-    print(f"Data Preparation Result: {result}")
-except Exception as e:
-    print(f"Data Preparation Error: {str(e)}")
-    # Fallback to regular data preparation
-    from data_preparation import DataPreparationPipeline
-    pipeline = DataPreparationPipeline()
-    result = pipeline.run_preparation_auto()
-    print(f"Data Preparation Fallback Result: {result}")
-"""
-    return run_python_script(script, "Data Preparation", **context)
+    def run():
+        from data_preparation import DataPreparationPipeline
+
+        print("Running data preparation...")
+        pipeline = DataPreparationPipeline()
+        result = pipeline.run_preparation_auto()
+        print(f"Data Preparation Result: {result.shape}")
+        return result.shape
+
+    def inputs():
+        from data_preparation import find_latest_csv
+        return [find_latest_csv()], 'data_preparation'
+
+    def outputs(result):
+        from data_preparation import PARQUET_AVAILABLE
+        ext = 'parquet' if PARQUET_AVAILABLE else 'csv'
+        return [f"data/processed/cleaned_data.{ext}", f"data/processed/cleaned_data_scaled.{ext}"]
+
+    return run_pipeline_task(run, "Data Preparation", cache_inputs=inputs, cache_outputs=outputs)
 
 
 # Data Transformation
 def data_transformation(**context):
     """Data Transformation and Storage"""
-    script = """
-import sys
-sys.path.append('src')
-from data_transformation_storage import DataTransformationStorage
+    def run():
+        from data_transformation_storage import DataTransformationStorage
 
-print("Running data transformation and storage...")
-transformation = DataTransformationStorage()
-result = transformation.run_transformation_pipeline_auto()
-print(f"Data Transformation Result: {result}")
-"""
-    return run_python_script(script, "Data Transformation", **context)
+        print("Running data transformation and storage...")
+        transformation = DataTransformationStorage()
+        try:
+            result_df, training_path = transformation.run_transformation_pipeline_auto()
+        finally:
+            # Checkpoint the SQLite WAL and release the database even when the step fails
+            transformation.close_connection()
+        print(f"Data Transformation Result: {result_df.shape}, {training_path}")
+        return training_path
+
+    def inputs():
+        from data_transformation_storage import find_latest_cleaned_file
+        return [find_latest_cleaned_file()], 'data_transformation_storage'
+
+    def outputs(training_path):
+        # The training set and DataTransformationStorage's default SQLite database
+        return [training_path, "data/processed/churn_data.db"]
+
+    return run_pipeline_task(run, "Data Transformation", cache_inputs=inputs, cache_outputs=outputs)
 
 
 # Feature Store
 def feature_store(**context):
     """Feature Store"""
-    script = """
-import sys
-sys.path.append('src')
-from feature_store import SimpleChurnFeatureStore
-
-print("Setting up feature store...")
-feature_store = SimpleChurnFeatureStore()
-result = feature_store.auto_populate_from_latest_data()
-feature_store.close()
-print(f"Feature Store Result: {result}")
-"""
-    return run_python_script(script, "Feature Store", **context)
+    def run():
+        from feature_store import SimpleChurnFeatureStore
+
+        print("Setting up feature store...")
+        store = SimpleChurnFeatureStore()
+        result = store.auto_populate_from_latest_data()
+        store.close()
+        print(f"Feature Store Result: {result}")
+        return result
+
+    return run_pipeline_task(run, "Feature Store")
 
 
 # Data Versioning
 def data_versioning(**context):
     """Data Versioning"""
-    script = """
-import sys
-sys.path.append('src')
-from data_versioning import version_pipeline_step
-from datetime import datetime
-
-print("Final data versioning...")
-tag = version_pipeline_step(
-    "Airflow Pipeline Complete",
-    f"Complete pipeline run at {datetime.now().isoformat()}"
-)
-print(f"Data Versioning Result: {tag}")
-"""
-    return run_python_script(script, "Data Versioning", **context)
+    def run():
+        from data_versioning import version_pipeline_step
+
+        print("Final data versioning...")
+        tag = version_pipeline_step(
+            "Airflow Pipeline Complete",
+            f"Complete pipeline run at {datetime.now().isoformat()}"
+        )
+        print(f"Data Versioning Result: {tag}")
+        return tag
+
+    return run_pipeline_task(run, "Data Versioning")
 
 
 # Model Building
 def model_building(**context):
     """Model Building"""
-    script = """
-import sys
-sys.path.append('src')
-from build_model import TrainCustomModel
+    def run():
+        from build_model import TrainCustomModel
 
-print("Starting model training pipeline...")
-model_builder = TrainCustomModel()
-model_builder.train_model(model_type="logistic_regression")
-print("Model Building completed successfully!")
-"""
-    return run_python_script(script, "Model Building", **context)
+        print("Starting model training pipeline...")
+        model_builder = TrainCustomModel()
+        model_builder.train_model(model_type="logistic_regression")
+        print("Model Building completed successfully!")
+        return "logistic_regression"
+
+    def inputs():
+        # Resolve the file without constructing TrainCustomModel (MLflow setup, model dir)
+        from build_model import _latest_file, training_data_candidates
+
+        features_path = os.environ.get('FEATURES_PATH', 'data/raw')
+        for dirpath, pattern, _ in training_data_candidates(features_path):
+            latest_file = _latest_file(dirpath, pattern)
+            if latest_file:
+                return [latest_file], 'build_model'
+        raise FileNotFoundError("No training data files found in any directory")
+
+    def outputs(result):
+        # train_model saves into data/models and prunes it to the newest few models
+        from build_model import _latest_file
+        model_file = _latest_file("data/models", "*.joblib")
+        return [model_file] if model_file else []
+
+    return run_pipeline_task(run, "Model Building", cache_inputs=inputs, cache_outputs=outputs)
 
 
 # Pipeline Success Callback
@@ -230,6 +332,8 @@ task_data_ingestion = PythonOperator(
     task_id='data_ingestion',
     python_callable=data_ingestion,
     dag=dag,
+    pool=CPU_POOL,
+    execution_timeout=task_timeout('data_ingestion'),
     doc_md="Fetch data from multiple sources"
 )
 
@@ -237,6 +341,8 @@ task_raw_data_storage = PythonOperator(
     task_id='raw_data_storage',
     python_callable=raw_data_storage,
     dag=dag,
+    pool=CPU_POOL,
+    execution_timeout=task_timeout('raw_data_storage'),
     doc_md="Organize and catalog raw data"
 )
 
@@ -244,6 +350,8 @@ task_data_validation = PythonOperator(
     task_id='data_validation',
     python_callable=data_validation,
     dag=dag,
+    pool=CPU_POOL,
+    execution_timeout=task_timeout('data_validation'),
     doc_md="Validate data quality and generate reports"
 )
 
@@ -251,6 +359,8 @@ task_data_preparation = PythonOperator(
     task_id='data_preparation',
     python_callable=data_preparation,
     dag=dag,
+    pool=HEAVY_POOL,
+    execution_timeout=task_timeout('data_preparation'),
     doc_md="Clean and preprocess data"
 )
 
@@ -258,6 +368,8 @@ task_data_transformation = PythonOperator(
     task_id='data_transformation',
     python_callable=data_transformation,
     dag=dag,
+    pool=CPU_POOL,
+    execution_timeout=task_timeout('data_transformation'),
     doc_md="Feature engineering and transformation"
 )
 
@@ -265,6 +377,8 @@ task_feature_store = PythonOperator(
     task_id='feature_store',
     python_callable=feature_store,
     dag=dag,
+    pool=CPU_POOL,
+    execution_timeout=task_timeout('feature_store'),
     doc_md="Manage engineered features in feature store"
 )
 
@@ -272,6 +386,8 @@ task_data_versioning = PythonOperator(
     task_id='data_versioning',
     python_callable=data_versioning,
     dag=dag,
+    pool=CPU_POOL,
+    execution_timeout=task_timeout('data_versioning'),
     doc_md="Version control for datasets with DVC"
 )
 
@@ -279,6 +395,8 @@ task_model_building = PythonOperator(
     task_id='model_building',
     python_callable=model_building,
     dag=dag,
+    pool=HEAVY_POOL,
+    execution_timeout=task_timeout('model_building'),
     doc_md="Train machine learning model"
 )
 
@@ -286,8 +404,13 @@ task_pipeline_success = PythonOperator(
     task_id='pipeline_success',
     python_callable=pipeline_success,
     dag=dag,
+    pool=CPU_POOL,
+    execution_timeout=task_timeout('pipeline_success'),
     doc_md="Final success notification"
 )
 
-# Define the complete pipeline sequence
-task_data_ingestion >> task_raw_data_storage >> task_data_validation >> task_data_preparation >> task_data_transformation >> task_feature_store >> task_data_versioning >> task_model_building >> task_pipeline_success
\ No newline at end of file
+# Define the pipeline graph: cataloging and validation only need the ingested
+# files, so they fan out after ingestion and join again at versioning
+task_data_ingestion >> [task_raw_data_storage, task_data_validation]
+task_data_validation >> task_data_preparation >> task_data_transformation >> task_feature_store
+[task_feature_store, task_raw_data_storage] >> task_data_versioning >> task_model_building >> task_pipeline_success
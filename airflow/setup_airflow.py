@@ -9,20 +9,19 @@ from pathlib import Path
 
 
 def run_command(cmd, check=True):
-    """Run a command and handle errors"""
+    """Run a command, streaming its output line by line"""
     print(f"Running: {cmd}")
-    try:
-        result = subprocess.run(
-            cmd, shell=True, check=check, capture_output=True, text=True)
-        if result.stdout:
-            print(result.stdout)
-        return result
-    except subprocess.CalledProcessError as e:
+    process = subprocess.Popen(
+        cmd, shell=True, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    for line in iter(process.stdout.readline, b''):
+        print(line.decode(errors='replace'), end='')
+    process.stdout.close()
+    process.wait()
+
+    if process.returncode != 0 and check:
         print(f"Error running command: {cmd}")
-        print(f"Error: {e.stderr}")
-        if check:
-            sys.exit(1)
-        return e
+        sys.exit(1)
+    return process
 
 
 def main():
@@ -37,6 +36,11 @@ def main():
     print("Initializing Airflow database...")
     run_command("airflow db init")
 
+    # Create resource pools used by the churn pipeline DAG
+    print("Creating resource pools...")
+    run_command('airflow pools set heavy_pool 1 "Memory-heavy data preparation and model training"')
+    run_command('airflow pools set cpu_pool 4 "Lightweight pipeline tasks"')
+
     # Create admin user
     print("Creating admin user...")
     username = os.getenv('AIRFLOW_WWW_USER_USERNAME', 'admin')
@@ -78,7 +78,11 @@ def run_transformation_steps():
     """Run data transformation and feature store steps"""
     print("Step 6: Running data transformation and storage...")
     transformation = DataTransformationStorage()
-    transformation_result = transformation.run_transformation_pipeline_auto()
+    try:
+        transformation_result = transformation.run_transformation_pipeline_auto()
+    finally:
+        # Checkpoint the SQLite WAL before the database is versioned
+        transformation.close_connection()
 
     print("Step 6.1: Versioning transformed data...")
     transformed_version_tag = version_pipeline_step(
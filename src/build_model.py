@@ -1,11 +1,20 @@
 # standalone_training_script.py
 import argparse
+import fnmatch
 import os
 from datetime import datetime
 from typing import Dict
 
 import joblib
+import numpy as np
 import pandas as pd
+from scipy import sparse
+from sklearn.ensemble import RandomForestClassifier
+from sklearn.linear_model import LogisticRegression
+from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
+from sklearn.model_selection import train_test_split
+
+from utils.logger import get_logger, PIPELINE_NAMES
 
 # Try to import MLflow, but make it optional for Python 3.13 compatibility
 try:
@@ -16,12 +25,83 @@ except ImportError as e:
     print(f"Warning: MLflow not available ({e}). Model tracking will be disabled.")
     MLFLOW_AVAILABLE = False
     mlflow = None
-from sklearn.ensemble import RandomForestClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.metrics import accuracy_score, f1_score, precision_score, recall_score
-from sklearn.model_selection import train_test_split
 
-from utils.logger import get_logger, PIPELINE_NAMES
+# joblib only supports LZ4 compression when python-lz4 is installed
+try:
+    import lz4.frame  # noqa: F401
+    MODEL_COMPRESSION = ('lz4', 3)
+except ImportError:
+    MODEL_COMPRESSION = ('zlib', 3)
+
+# PyArrow gives a multi-threaded CSV reader with column projection; fall back to pandas
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Target column predicted by every model
+TARGET_COL = 'Churn'
+
+# Number of most recent model files kept in the model directory
+MAX_SAVED_MODELS = 5
+
+# Binary indicator columns are stored sparse when at most this fraction is non-zero
+SPARSE_DENSITY_THRESHOLD = 0.3
+
+# Bump when _read_feature_frame/_load_features change their output; joblib only
+# notices edits to the cached function itself, not to its helpers or constants
+FEATURE_CACHE_VERSION = 1
+
+# Tracking URI once MLflow has been configured for this process
+_MLFLOW_TRACKING_URI = None
+
+
+def _setup_mlflow() -> str:
+    """Configure the MLflow tracking URI and experiment once per process."""
+    global _MLFLOW_TRACKING_URI
+    if _MLFLOW_TRACKING_URI is None:
+        tracking_uri = os.environ.get('MLFLOW_TRACKING_URI', 'file:///tmp/mlflow-runs')
+        mlflow.set_tracking_uri(tracking_uri)
+        mlflow.set_experiment("Customer Churn Prediction")
+        _MLFLOW_TRACKING_URI = tracking_uri
+    return _MLFLOW_TRACKING_URI
+
+
+def _latest_file(dirpath: str, pattern: str):
+    """Return the newest file in dirpath matching pattern (single scandir pass), or None."""
+    try:
+        with os.scandir(dirpath) as entries:
+            matches = [entry for entry in entries
+                       if entry.is_file() and fnmatch.fnmatch(entry.name, pattern)]
+    except FileNotFoundError:
+        return None
+    latest = max(matches, key=lambda entry: entry.stat().st_ctime, default=None)
+    return latest.path if latest else None
+
+
+def _feature_cache_params() -> dict:
+    """Everything besides the input file that changes what _load_features returns."""
+    return {
+        'version': FEATURE_CACHE_VERSION,
+        'target_col': TARGET_COL,
+        'sparse_density_threshold': SPARSE_DENSITY_THRESHOLD,
+        # The pyarrow and pandas readers can infer different column sets
+        'pyarrow': PYARROW_AVAILABLE,
+    }
+
+
+def training_data_candidates(features_path: str) -> list:
+    """(directory, pattern, label) search order: training sets, then processed data, then raw data."""
+    return [
+        ("data/processed/training_sets", "*.csv", "training"),
+        ("data/processed", "cleaned_data*.parquet", "processed"),
+        ("data/processed", "cleaned_data*.csv", "processed"),
+        (features_path, "customer_churn_*.csv", "raw"),
+    ]
 
 
 class TrainCustomModel:
@@ -35,23 +115,30 @@ class TrainCustomModel:
 
         # init model save dir
         self.model_dir = "data/models"
+
+        # Feature column names of the last loaded dataset (X is a plain ndarray)
+        self.feature_names = []
+
+        # Parsed feature matrices are memoized on disk across runs
+        self._mem = joblib.Memory('data/.jlcache', verbose=0)
+        self._load_features_cached = self._mem.cache(self._load_features, ignore=['self'])
         os.makedirs(self.model_dir, exist_ok=True)
 
         # MLflow configuration for experiment tracking
         if MLFLOW_AVAILABLE:
-            self.mlflow_tracking_uri = os.environ.get(
-                'MLFLOW_TRACKING_URI', 'file:///tmp/mlflow-runs')
-            mlflow.set_tracking_uri(self.mlflow_tracking_uri)
-            mlflow.set_experiment("Customer Churn Prediction")
+            self.mlflow_tracking_uri = _setup_mlflow()
             self.logger.info("MLflow tracking enabled")
+            # The model is already saved with joblib; only log it to MLflow when asked
+            self.log_artifact = os.environ.get('MLFLOW_LOG_MODEL', '0') == '1'
         else:
             self.mlflow_tracking_uri = None
+            self.log_artifact = False
             self.logger.warning("MLflow tracking disabled - not available")
 
         # A dictionary mapping model names to their scikit-learn classifier instances.
         self.available_models = {
-            "random_forest": RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced'),
-            "logistic_regression": LogisticRegression(random_state=42, class_weight='balanced', max_iter=1000)
+            "random_forest": RandomForestClassifier(n_estimators=100, random_state=42, class_weight='balanced', n_jobs=-1),
+            "logistic_regression": LogisticRegression(solver='liblinear', random_state=42, class_weight='balanced', max_iter=200)
         }
 
     def get_latest_training_data(self) -> str:
@@ -61,55 +148,80 @@ class TrainCustomModel:
         Returns:
             str: Path to the latest training data file
         """
-        import glob
-
-        # Check for training sets first (preferred)
-        training_sets_dir = "data/processed/training_sets"
-        if os.path.exists(training_sets_dir):
-            pattern = os.path.join(training_sets_dir, "*.csv")
-            files = glob.glob(pattern)
-            if files:
-                # Get the most recent file
-                latest_file = max(files, key=os.path.getctime)
-                self.logger.info(f"Using latest training data: {latest_file}")
+        for dirpath, pattern, label in training_data_candidates(self.features_path):
+            latest_file = _latest_file(dirpath, pattern)
+            if latest_file:
+                self.logger.info(f"Using latest {label} data: {latest_file}")
                 return latest_file
 
-        # Fallback to processed directory
-        processed_dir = "data/processed"
-        if os.path.exists(processed_dir):
-            pattern = os.path.join(processed_dir, "cleaned_data*.csv")
-            files = glob.glob(pattern)
-            if files:
-                latest_file = max(files, key=os.path.getctime)
-                self.logger.info(f"Using latest processed data: {latest_file}")
-                return latest_file
-
-        # Final fallback to raw directory
-        pattern = os.path.join(self.features_path, "customer_churn_*.csv")
-        files = glob.glob(pattern)
-        if files:
-            latest_file = max(files, key=os.path.getctime)
-            self.logger.info(f"Using latest raw data: {latest_file}")
-            return latest_file
-
         raise FileNotFoundError(
             "No training data files found in any directory")
 
-    def load_and_split_data(self, feature_file: str) -> tuple:
+    def _read_feature_frame(self, feature_file: str) -> pd.DataFrame:
         """
-        Loads data from a CSV file, performs basic cleaning, and splits it for training.
+        Reads only the columns used for training from a feature CSV or Parquet file.
+
+        The schema is probed first (CSV: first block, Parquet: file footer) so
+        non-numeric columns (e.g. customerID) are never parsed.
 
         Args: feature_file (str): The full path to the feature data file.
-        Returns: tuple: A tuple containing (X_train, X_test, y_train, y_test).
+        Returns: pd.DataFrame: Numeric columns plus the target and 'TotalCharges'.
         """
-        self.logger.info(f"Loading data from {feature_file}...")
-        if not os.path.exists(feature_file):
-            self.logger.error(
-                f"Feature data file not found at: {feature_file}")
-            raise FileNotFoundError(
-                f"Feature data file not found at: {feature_file}")
+        if not PYARROW_AVAILABLE:
+            # Probe dtypes on a sample to pick the columns, then parse only those.
+            # dtypes are inferred from the full file (a text value past the sample
+            # must not fail the read); _load_features downcasts to float32 afterwards
+            sample = pd.read_csv(feature_file, nrows=1000)
+            numeric_cols = sample.select_dtypes(include=['number']).columns.tolist()
+            keep_cols = numeric_cols + [col for col in (TARGET_COL, 'TotalCharges')
+                                        if col in sample.columns and col not in numeric_cols]
+            return pd.read_csv(feature_file, usecols=keep_cols)
+
+        is_parquet = feature_file.endswith('.parquet')
+        if is_parquet:
+            schema = pq.read_schema(feature_file)
+        else:
+            reader = pacsv.open_csv(feature_file)
+            schema = reader.schema
+            reader.close()
+
+        keep_cols = [field.name for field in schema
+                     if pa.types.is_integer(field.type) or pa.types.is_floating(field.type)]
+        keep_cols += [col for col in (TARGET_COL, 'TotalCharges')
+                      if col in schema.names and col not in keep_cols]
+
+        if is_parquet:
+            table = pq.read_table(feature_file, columns=keep_cols)
+        else:
+            table = pacsv.read_csv(
+                feature_file,
+                convert_options=pacsv.ConvertOptions(include_columns=keep_cols))
 
-        df = pd.read_csv(feature_file)
+        # Fill missing numeric TotalCharges in Arrow; text values are coerced later
+        if 'TotalCharges' in table.column_names:
+            idx = table.schema.get_field_index('TotalCharges')
+            if not pa.types.is_string(table.schema.field(idx).type):
+                table = table.set_column(
+                    idx, 'TotalCharges', pc.fill_null(table.column(idx), 0))
+
+        return table.to_pandas(split_blocks=True, self_destruct=True)
+
+    def _load_features(self, feature_file: str, file_mtime: float, cache_params: dict) -> tuple:
+        """
+        Loads a feature CSV and builds the feature matrix and encoded target.
+
+        Memoized on disk by joblib; file_mtime and cache_params are part of the
+        cache key so a rewritten file or changed loading settings invalidate the entry.
+
+        Args:
+            feature_file (str): The full path to the feature data file.
+            file_mtime (float): Modification time of feature_file.
+            cache_params (dict): Settings that shape the output (see _feature_cache_params).
+        Returns: tuple: A tuple containing (X, y, feature_names).
+        """
+        df = self._read_feature_frame(feature_file)
+        if TARGET_COL not in df.columns:
+            raise KeyError(f"Target column '{TARGET_COL}' not found in {feature_file}")
 
         # Drop  non-numeric customerID column
         if 'customerID' in df.columns:
@@ -120,37 +232,68 @@ class TrainCustomModel:
         if 'TotalCharges' in df.columns:
             self.logger.info("Cleaning 'TotalCharges' column.")
             df['TotalCharges'] = pd.to_numeric(
-                df['TotalCharges'], errors='coerce')
-            df['TotalCharges'].fillna(0, inplace=True)
+                df['TotalCharges'], errors='coerce', downcast='float').fillna(0)
 
         # Select only numeric columns for features
         self.logger.info("Selecting only numeric features for training.")
         numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-        features = [col for col in numeric_cols if col !=
-                    'Churn' and col != 'Churn']
-        X = df[features]
-
-        # Identify and encode the target variable 'Churn' from text to binary (1/0).
-        target_col = 'Churn' if 'Churn' in df.columns else 'Churn'
-        y = df[target_col]
-        if y.dtype == 'object':
+        # Train on a float32 feature matrix (half the memory traffic of float64)
+        df = df.astype({col: np.float32 for col in numeric_cols if col != TARGET_COL})
+        features = [col for col in numeric_cols if col != TARGET_COL]
+        # Contiguous float32 matrix: split and fit slice it without per-column copies
+        X = np.ascontiguousarray(df[features].to_numpy(dtype=np.float32))
+        feature_names = features
+
+        # When the binary 0/1 columns (encoded categoricals) are mostly zero, store
+        # the matrix as CSR so sklearn uses its sparse code paths. Converted whole,
+        # the columns keep the feature_names order the model is trained on
+        binary_mask = np.all((X == 0) | (X == 1), axis=0)
+        if binary_mask.any() and X[:, binary_mask].mean() <= SPARSE_DENSITY_THRESHOLD:
+            X = sparse.csr_matrix(X)
             self.logger.info(
-                f"Converting target variable '{target_col}' to binary (1/0).")
-            y = y.apply(lambda x: 1 if x == 'Yes' else 0)
+                f"Using sparse matrix for {int(binary_mask.sum())} binary features.")
+
+        # Encode the target as int8 1/0; text labels ('Yes'/'No') are compared vectorized
+        y = df[TARGET_COL].to_numpy()
+        if y.dtype == object:
+            self.logger.info(
+                f"Converting target variable '{TARGET_COL}' to binary (1/0).")
+            y = (y == 'Yes').astype(np.int8)
+        else:
+            y = y.astype(np.int8)
+
+        return X, y, feature_names
+
+    def load_and_split_data(self, feature_file: str) -> tuple:
+        """
+        Loads data from a CSV file, performs basic cleaning, and splits it for training.
+
+        Args: feature_file (str): The full path to the feature data file.
+        Returns: tuple: A tuple containing (X_train, X_test, y_train, y_test).
+        """
+        self.logger.info(f"Loading data from {feature_file}...")
+        if not os.path.exists(feature_file):
+            self.logger.error(
+                f"Feature data file not found at: {feature_file}")
+            raise FileNotFoundError(
+                f"Feature data file not found at: {feature_file}")
+
+        X, y, self.feature_names = self._load_features_cached(
+            feature_file, os.path.getmtime(feature_file), _feature_cache_params())
 
         self.logger.info(
-            f"Training with {len(X.columns)} features: {X.columns.tolist()}")
+            f"Training with {len(self.feature_names)} features: {self.feature_names}")
 
         return train_test_split(X, y, test_size=0.2, random_state=42, stratify=y)
 
-    def evaluate_model(self, model, X_test: pd.DataFrame, y_test: pd.Series) -> Dict[str, float]:
+    def evaluate_model(self, model, X_test, y_test: np.ndarray) -> Dict[str, float]:
         """
         Evaluates the trained model on the test set and returns a dictionary of performance metrics.
 
         Args:
             model: The trained scikit-learn model.
-            X_test (pd.DataFrame): The test features.
-            y_test (pd.Series): The test target variable.
+            X_test (np.ndarray or sparse.csr_matrix): The test features.
+            y_test (np.ndarray): The test target variable.
 
         Returns: 
             Dict[str, float]: A dictionary containing accuracy, precision, recall, and F1 score.
@@ -165,6 +308,23 @@ class TrainCustomModel:
         }
         return metrics
 
+    def save_model(self, model, model_path: str) -> None:
+        """
+        Saves a compressed model file and prunes older models from the model directory.
+
+        Args:
+            model: The trained scikit-learn model.
+            model_path (str): Destination path of the model file.
+        """
+        joblib.dump(model, model_path, compress=MODEL_COMPRESSION, protocol=5)
+
+        model_files = [os.path.join(self.model_dir, name) for name in os.listdir(self.model_dir)
+                       if name.endswith('.joblib')]
+        model_files.sort(key=os.path.getctime, reverse=True)
+        for old_model in model_files[MAX_SAVED_MODELS:]:
+            os.remove(old_model)
+            self.logger.info(f"Removed old model: {old_model}")
+
     def train_model(self, model_type: str):
         """
         The main function to orchestrate the model training, evaluation, and logging process.
@@ -204,9 +364,10 @@ class TrainCustomModel:
 
                     self.logger.info("Logging experiment to MLflow...")
                     mlflow.log_param("model_type", model_type)
-                    mlflow.log_param("features_used", list(X_train.columns))
+                    mlflow.log_param("features_used", self.feature_names)
                     mlflow.log_metrics(metrics)
-                    mlflow.sklearn.log_model(model, "model")
+                    if self.log_artifact:
+                        mlflow.sklearn.log_model(model, "model")
 
                     print("\n--- Training Complete ---")
                     print(f"Model Type: {model_type}")
@@ -217,7 +378,7 @@ class TrainCustomModel:
                     print("\n" + "="*50)
                     self.logger.info(
                         f"Successfully trained model and logged to MLflow. Weights saved at {model_path}")
-                    joblib.dump(model, model_path)
+                    self.save_model(model, model_path)
                     print(
                         f"\nTo view this run, start the MLflow UI with:\nmlflow ui --backend-store-uri {self.mlflow_tracking_uri}")
             else:
@@ -241,7 +402,7 @@ class TrainCustomModel:
                 print("\n" + "="*50)
                 self.logger.info(
                     f"Successfully trained model. Weights saved at {model_path}")
-                joblib.dump(model, model_path)
+                self.save_model(model, model_path)
                 print(f"\nModel saved to: {model_path}")
 
         except FileNotFoundError as e:
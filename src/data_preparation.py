@@ -3,19 +3,20 @@ Data Preparation Pipeline
 ------------------------
 Cleans and preprocesses dataset for modeling:
 - Handles missing values (numeric: median, categorical: mode)
-- One-hot encodes categorical features; maps 'Churn' to 0/1
+- Label-encodes categorical features to <col>_encoded codes; maps 'Churn' to 0/1
 - Creates derived features and caps outliers (IQR method)
 - Scales numerical features using StandardScaler
 
 Saves:
-- EDA outputs: data/eda/raw and data/eda/cleaned
-- Cleaned and scaled datasets: data/processed
+- EDA outputs (when generate_eda=True): data/eda/raw and data/eda/cleaned
+- Cleaned and scaled datasets: data/processed (Parquet when pyarrow is installed, else CSV)
 """
 
 import pandas as pd
 import numpy as np
 import os
 import glob
+import contextlib
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -27,21 +28,93 @@ import seaborn as sns
 
 from sklearn.preprocessing import StandardScaler
 
+# Optional: Parquet output (keeps compact dtypes, avoids a text round-trip)
+try:
+    import pyarrow as pa
+    PARQUET_AVAILABLE = True
+except ImportError:
+    PARQUET_AVAILABLE = False
+
 from utils.logger import get_logger, PIPELINE_NAMES
+from data_validation import get_arrow_cache_path
 
 # Get logger for this pipeline
 logger = get_logger(PIPELINE_NAMES['DATA_PREPARATION'])
 
+# Fixed Telco vocabulary; label codes follow this (sorted) order
+_YES_NO = ['No', 'Yes']
+_INTERNET_ADDON = ['No', 'No internet service', 'Yes']
+KNOWN_CATEGORIES = {
+    'gender': ['Female', 'Male'],
+    'Partner': _YES_NO,
+    'Dependents': _YES_NO,
+    'PhoneService': _YES_NO,
+    'MultipleLines': ['No', 'No phone service', 'Yes'],
+    'InternetService': ['DSL', 'Fiber optic', 'No'],
+    'OnlineSecurity': _INTERNET_ADDON,
+    'OnlineBackup': _INTERNET_ADDON,
+    'DeviceProtection': _INTERNET_ADDON,
+    'TechSupport': _INTERNET_ADDON,
+    'StreamingTV': _INTERNET_ADDON,
+    'StreamingMovies': _INTERNET_ADDON,
+    'Contract': ['Month-to-month', 'One year', 'Two year'],
+    'PaperlessBilling': _YES_NO,
+    'PaymentMethod': ['Bank transfer (automatic)', 'Credit card (automatic)',
+                      'Electronic check', 'Mailed check'],
+}
+
+# Compact dtypes for the raw Telco CSV. TotalCharges is left out on purpose:
+# the raw file contains blank strings there and it is coerced in handle_missing_values.
+# tenure is read as float32 so blank cells survive as NaN for the median fill; it is
+# downcast to an integer type after imputation.
+CHURN_DTYPES = {
+    'customerID': 'string',
+    'SeniorCitizen': 'int8',
+    'tenure': 'float32',
+    'MonthlyCharges': 'float32',
+    # Plain 'category' keeps every value read; _cast_known_categories then narrows to
+    # KNOWN_CATEGORIES and reports anything outside the vocabulary
+    **{col: 'category' for col in KNOWN_CATEGORIES},
+}
+
+
+def _cast_known_categories(df: pd.DataFrame) -> pd.DataFrame:
+    """Cast the fixed-vocabulary columns to KNOWN_CATEGORIES; unknown values become NaN with a warning."""
+    for col, categories in KNOWN_CATEGORIES.items():
+        if col not in df.columns:
+            continue
+        unknown = [value for value in df[col].astype('category').cat.categories
+                   if value not in categories]
+        if unknown:
+            count = int(df[col].isin(unknown).sum())
+            logger.warning(f"{col}: {count} values outside the known categories {unknown}; "
+                           f"treated as missing")
+        df[col] = df[col].astype(pd.CategoricalDtype(categories))
+    return df
+
 class DataPreparationPipeline:
-    def __init__(self):
-        """Initialize pipeline with scaler and numerical columns."""
+    def __init__(self, generate_eda: bool = False):
+        """Initialize pipeline with scaler and numerical columns.
+
+        EDA plots are only rendered when ``generate_eda`` is set.
+        """
+        self.generate_eda = generate_eda
         self.scaler = StandardScaler()
         self.numerical_columns = ['tenure', 'MonthlyCharges', 'TotalCharges']
 
     def load_data(self, file_path: str) -> pd.DataFrame:
-        """Load CSV file into DataFrame."""
+        """Load CSV file into DataFrame (from the validator's Arrow cache when present)."""
         try:
-            df = pd.read_csv(file_path)
+            cache_path = get_arrow_cache_path(file_path) if PARQUET_AVAILABLE else None
+            if cache_path and os.path.exists(cache_path):
+                with pa.memory_map(cache_path) as source:
+                    table = pa.ipc.open_file(source).read_all()
+                    dtypes = {c: t for c, t in CHURN_DTYPES.items() if c in table.column_names}
+                    df = table.to_pandas().astype(dtypes)
+                logger.info(f"Loaded data from Arrow cache: {cache_path}")
+            else:
+                df = pd.read_csv(file_path, dtype=CHURN_DTYPES, engine='c')
+            df = _cast_known_categories(df)
             logger.info(f"Loaded data: {df.shape}")
             return df
         except Exception as e:
@@ -50,70 +123,96 @@ class DataPreparationPipeline:
 
     def handle_missing_values(self, df: pd.DataFrame) -> pd.DataFrame:
         """Impute missing values: median for numeric, mode for categorical."""
-        df_cleaned = df.copy()
-        df_cleaned['TotalCharges'] = pd.to_numeric(df_cleaned['TotalCharges'], errors='coerce')
-        for column in df_cleaned.columns:
-            if df_cleaned[column].isnull().sum() > 0:
-                if df_cleaned[column].dtype in ['int64', 'float64']:
-                    imputer = df_cleaned[column].median()
-                    df_cleaned[column].fillna(imputer, inplace=True)
-                    logger.info(f"Filled {column} with median: {imputer}")
-                else:
-                    imputer = df_cleaned[column].mode()[0]
-                    df_cleaned[column].fillna(imputer, inplace=True)
-                    logger.info(f"Filled {column} with mode: {imputer}")
-        return df_cleaned
+        df['TotalCharges'] = pd.to_numeric(df['TotalCharges'], errors='coerce')
+        missing_cols = df.columns[df.isna().any()]
+        if len(missing_cols) == 0:
+            return self._downcast_tenure(df)
+        numeric_cols = [c for c in missing_cols if pd.api.types.is_numeric_dtype(df[c])]
+        other_cols = [c for c in missing_cols if c not in numeric_cols]
+        medians = df[numeric_cols].median().to_dict() if numeric_cols else {}
+        modes = df[other_cols].mode().iloc[0].to_dict() if other_cols else {}
+        df = df.fillna({**medians, **modes})
+        for column, value in medians.items():
+            logger.info(f"Filled {column} with median: {value}")
+        for column, value in modes.items():
+            logger.info(f"Filled {column} with mode: {value}")
+        return self._downcast_tenure(df)
+
+    def _downcast_tenure(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Downcast tenure to the smallest integer type once it has no NaNs (kept float if a fill was fractional)."""
+        if 'tenure' in df.columns:
+            df['tenure'] = pd.to_numeric(df['tenure'], downcast='integer')
+        return df
 
     def encode_categorical(self, df: pd.DataFrame) -> pd.DataFrame:
-        """One-hot encode categorical columns; map Churn to 0/1."""
-        df_encoded = df.copy()
-        categorical_cols = df.select_dtypes(include=['object']).columns.tolist()
-        categorical_cols = [col for col in categorical_cols if col not in ['customerID', 'Churn']]
-        if categorical_cols:
-            df_encoded = pd.get_dummies(df_encoded, columns=categorical_cols, drop_first=True)
-            logger.info(f"One-hot encoded {len(categorical_cols)} columns")
-        if 'Churn' in df_encoded.columns:
-            df_encoded['Churn'] = df_encoded['Churn'].map({'Yes': 1, 'No': 0})
+        """Label-encode known categoricals to int8 codes; map Churn to 0/1."""
+        known_cols = [col for col in KNOWN_CATEGORIES if col in df.columns]
+        for col in known_cols:
+            codes = pd.Categorical(df[col], categories=KNOWN_CATEGORIES[col]).codes
+            # Frames not loaded through load_data can still carry values outside the
+            # vocabulary; their -1 code must not reach the model as an extra level
+            unknown = (codes == -1) & df[col].notna().to_numpy()
+            if unknown.any():
+                valid = codes[codes >= 0]
+                fill = np.bincount(valid).argmax() if valid.size else 0
+                logger.warning(f"{col}: {int(unknown.sum())} values outside the known categories "
+                               f"{sorted(df.loc[unknown, col].astype(str).unique())}; "
+                               f"encoded as the most frequent code {fill}")
+                codes = np.where(unknown, fill, codes)
+            df[f"{col}_encoded"] = codes.astype(np.int8, copy=False)
+        if known_cols:
+            df = df.drop(columns=known_cols)
+            logger.info(f"Label encoded {len(known_cols)} columns")
+        # Columns outside the fixed schema still get one-hot encoded
+        other_cols = df.select_dtypes(include=['object', 'category']).columns.tolist()
+        other_cols = [col for col in other_cols if col not in ['customerID', 'Churn']]
+        if other_cols:
+            df = pd.get_dummies(df, columns=other_cols, drop_first=True, dtype=np.int8)
+            logger.info(f"One-hot encoded {len(other_cols)} columns")
+        if 'Churn' in df.columns:
+            df['Churn'] = (df['Churn'].to_numpy() == 'Yes').astype(np.int8)
             logger.info("Encoded 'Churn' to 0/1")
-        return df_encoded
+        return df
 
     def engineer_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Create derived features for churn prediction."""
-        df_features = df.copy()
-        df_features['tenure_group'] = pd.cut(
-            df_features['tenure'], 
-            bins=[0, 12, 24, 48, 72], 
-            labels=['0-12', '12-24', '24-48', '48+']
-        ).cat.codes
-        df_features['charges_per_tenure'] = df_features['MonthlyCharges'] / (df_features['tenure'] + 1)
-        df_features['total_to_monthly_ratio'] = df_features['TotalCharges'] / df_features['MonthlyCharges']
-        df_features['avg_monthly_charges'] = df_features['TotalCharges'] / (df_features['tenure'] + 1)
+        tenure = df['tenure'].to_numpy(np.float32)
+        monthly = df['MonthlyCharges'].to_numpy(np.float32)
+        total = df['TotalCharges'].to_numpy(np.float32)
+        inv_tenure_p1 = np.float32(1.0) / (tenure + np.float32(1.0))
+        # Buckets: <=12, <=24, <=48, >48 months
+        df['tenure_group'] = np.digitize(tenure, [12, 24, 48], right=True).astype(np.int8)
+        df['charges_per_tenure'] = monthly * inv_tenure_p1
+        df['total_to_monthly_ratio'] = total / monthly
+        df['avg_monthly_charges'] = total * inv_tenure_p1
         logger.info("Created derived features")
-        return df_features
+        return df
 
     def cap_outliers(self, df: pd.DataFrame, columns: list) -> pd.DataFrame:
         """Cap outliers using IQR method."""
-        df_clean = df.copy()
-        for column in columns:
-            if column in df_clean.columns:
-                Q1, Q3 = df_clean[column].quantile([0.25, 0.75])
-                IQR = Q3 - Q1
-                lower, upper = Q1 - 1.5 * IQR, Q3 + 1.5 * IQR
-                outliers = ((df_clean[column] < lower) | (df_clean[column] > upper)).sum()
-                if outliers > 0:
-                    df_clean[column] = df_clean[column].clip(lower, upper)
-                    logger.info(f"Capped {outliers} outliers in {column}")
-        return df_clean
+        columns = [column for column in columns if column in df.columns]
+        if not columns:
+            return df
+        arr = df[columns].to_numpy(dtype=np.float64, copy=True)
+        q1, q3 = np.nanquantile(arr, [0.25, 0.75], axis=0)
+        iqr = q3 - q1
+        lower, upper = q1 - 1.5 * iqr, q3 + 1.5 * iqr
+        outliers = ((arr < lower) | (arr > upper)).sum(axis=0)
+        np.clip(arr, lower, upper, out=arr)
+        for j, column in enumerate(columns):
+            if outliers[j] > 0:
+                df[column] = arr[:, j]
+                logger.info(f"Capped {outliers[j]} outliers in {column}")
+        return df
 
     def scale_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Scale numerical features using StandardScaler."""
-        df_scaled = df.copy()
         num_cols = [col for col in df.select_dtypes(include=[np.number]).columns 
                    if col not in ['Churn', 'customerID']]
         if num_cols:
-            df_scaled[num_cols] = self.scaler.fit_transform(df_scaled[num_cols])
+            df[num_cols] = self.scaler.fit_transform(df[num_cols])
             logger.info(f"Scaled {len(num_cols)} numerical features")
-        return df_scaled
+        return df
 
     def save_eda_plots(self, df: pd.DataFrame, output_dir: str):
         """Generate and save EDA plots."""
@@ -125,54 +224,59 @@ class DataPreparationPipeline:
             plt.title('Churn Distribution')
             plt.savefig(f"{output_dir}/churn_distribution.png")
             plt.close()
+        num_df = df.select_dtypes(include=[np.number])
         plt.figure(figsize=(10, 8))
-        sns.heatmap(df.select_dtypes(include=[np.number]).corr(), annot=False, cmap='coolwarm', center=0)
+        sns.heatmap(num_df.corr(), annot=False, cmap='coolwarm', center=0)
         plt.title('Correlation Heatmap')
         plt.savefig(f"{output_dir}/correlation_heatmap.png")
         plt.close()
-        num_cols = df.select_dtypes(include=[np.number]).columns[:6]
+        num_cols = num_df.columns[:6]
         if num_cols.size > 0:
-            fig, axes = plt.subplots(2, 3, figsize=(15, 8))
-            axes = axes.ravel()
-            for i, col in enumerate(num_cols):
-                if i < len(axes):
-                    df[col].hist(bins=30, ax=axes[i])
-                    axes[i].set_title(f'{col} Distribution')
-            plt.tight_layout()
-            plt.savefig(f"{output_dir}/distributions.png")
-            plt.close()
-            fig, axes = plt.subplots(2, 3, figsize=(15, 8))
-            axes = axes.ravel()
-            for i, col in enumerate(num_cols):
-                if i < len(axes):
-                    sns.boxplot(x=df[col], ax=axes[i])
-                    axes[i].set_title(f'{col} Box Plot')
-            plt.tight_layout()
-            plt.savefig(f"{output_dir}/box_plots.png")
-            plt.close()
+            # Histograms and box plots are filled in the same pass over the columns
+            hist_fig, hist_axes = plt.subplots(2, 3, figsize=(15, 8), constrained_layout=True)
+            box_fig, box_axes = plt.subplots(2, 3, figsize=(15, 8), constrained_layout=True)
+            for col, hist_ax, box_ax in zip(num_cols, hist_axes.ravel(), box_axes.ravel()):
+                num_df[col].hist(bins=30, ax=hist_ax)
+                hist_ax.set_title(f'{col} Distribution')
+                sns.boxplot(x=num_df[col], ax=box_ax)
+                box_ax.set_title(f'{col} Box Plot')
+            hist_fig.savefig(f"{output_dir}/distributions.png")
+            box_fig.savefig(f"{output_dir}/box_plots.png")
+            plt.close(hist_fig)
+            plt.close(box_fig)
         logger.info(f"EDA plots saved to {output_dir}")
 
     def run_pipeline(self, input_file: str, output_file: str) -> pd.DataFrame:
         """Run full data preparation pipeline."""
         logger.info("Starting data preparation pipeline")
         os.makedirs(os.path.dirname(output_file), exist_ok=True)
-        os.makedirs("data/eda/raw", exist_ok=True)
-        os.makedirs("data/eda/cleaned", exist_ok=True)
-        df = self.load_data(input_file)
-        self.save_eda_plots(df, "data/eda/raw")
-        df = self.handle_missing_values(df)
-        df = self.encode_categorical(df)
-        df = self.engineer_features(df)
-        df = self.cap_outliers(df, self.numerical_columns)
-        df_scaled = self.scale_features(df)
-        self.save_eda_plots(df, "data/eda/cleaned")
-        df.to_csv(output_file, index=False)
-        logger.info(f"Cleaned data saved to {output_file}")
-        scaled_output = output_file.replace(".csv", "_scaled.csv")
-        df_scaled.to_csv(scaled_output, index=False)
-        logger.info(f"Scaled data saved to {scaled_output}")
+        with _copy_on_write():
+            df = self.load_data(input_file)
+            if self.generate_eda:
+                self.save_eda_plots(df, "data/eda/raw")
+            df = self.handle_missing_values(df)
+            df = self.encode_categorical(df)
+            df = self.engineer_features(df)
+            df = self.cap_outliers(df, self.numerical_columns)
+            # Stages mutate the frame in place; keep the unscaled frame for the cleaned output
+            df_scaled = self.scale_features(df.copy())
+            if self.generate_eda:
+                self.save_eda_plots(df, "data/eda/cleaned")
+            output_file = self.save_frame(df, output_file)
+            logger.info(f"Cleaned data saved to {output_file}")
+            scaled_output = self.save_frame(df_scaled, os.path.splitext(output_file)[0] + "_scaled.csv")
+            logger.info(f"Scaled data saved to {scaled_output}")
         return df
 
+    def save_frame(self, df: pd.DataFrame, output_file: str) -> str:
+        """Write frame as zstd Parquet when pyarrow is available, else CSV; return the path written."""
+        if PARQUET_AVAILABLE:
+            output_file = os.path.splitext(output_file)[0] + ".parquet"
+            df.to_parquet(output_file, engine='pyarrow', compression='zstd', index=False)
+        else:
+            df.to_csv(output_file, index=False)
+        return output_file
+
     def run_preparation_auto(self):
         """Run preparation pipeline with automatic file detection"""
         input_file = find_latest_csv()
@@ -180,6 +284,12 @@ class DataPreparationPipeline:
         logger.info(f"Auto-detected input file: {input_file}")
         return self.run_pipeline(input_file, output_file)
 
+def _copy_on_write():
+    """Lazy copies for the preparation stages (pandas >= 1.5), scoped so other modules keep the default mode."""
+    if hasattr(pd.options.mode, 'copy_on_write'):
+        return pd.option_context('mode.copy_on_write', True)
+    return contextlib.nullcontext()
+
 def find_latest_csv() -> str:
     """Find most recent CSV file in data/raw."""
     patterns = [
@@ -194,7 +304,7 @@ def find_latest_csv() -> str:
     return max(candidates, key=os.path.getctime)
 
 if __name__ == "__main__":
-    pipeline = DataPreparationPipeline()
+    pipeline = DataPreparationPipeline(generate_eda=True)
     input_file = find_latest_csv()
     output_file = "data/processed/cleaned_data.csv"
     print("Running data preparation pipeline...")
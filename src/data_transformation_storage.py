@@ -19,6 +19,14 @@ from utils.logger import get_logger, PIPELINE_NAMES
 # Get logger for this pipeline
 logger = get_logger(PIPELINE_NAMES['DATA_TRANSFORMATION'])
 
+# Compact dtypes for the cleaned CSV; remaining columns are already 0/1 or numeric
+CLEANED_DTYPES = {
+    'customerID': 'string',
+    'tenure': 'float32',
+    'MonthlyCharges': 'float32',
+    'TotalCharges': 'float32',
+}
+
 class DataTransformationStorage:
     """Transform features and persist them in SQLite with metadata tracking."""
     def __init__(self, db_path: str = "data/processed/churn_data.db"):
@@ -28,11 +36,17 @@ class DataTransformationStorage:
         self.conn = sqlite3.connect(db_path)
         self.standard_scaler = StandardScaler()
         self.minmax_scaler = MinMaxScaler()
+        self._run_time = None
         self.setup_database()
 
     def setup_database(self):
         """Create tables and indexes for features, metadata, and training sets."""
         cursor = self.conn.cursor()
+        # WAL + NORMAL sync: one fsync per checkpoint instead of per commit
+        cursor.execute("PRAGMA journal_mode=WAL")
+        cursor.execute("PRAGMA synchronous=NORMAL")
+        cursor.execute("PRAGMA temp_store=MEMORY")
+        cursor.execute("PRAGMA cache_size=-65536")
         cursor.execute("""
             CREATE TABLE IF NOT EXISTS customer_features (
                 customer_id TEXT PRIMARY KEY,
@@ -99,29 +113,33 @@ class DataTransformationStorage:
         self.conn.commit()
         logger.info("SQLite database initialized")
 
+    def _now(self) -> datetime:
+        """Timestamp of the current pipeline run, or the wall clock outside a run."""
+        return self._run_time or datetime.now()
+
     def create_aggregated_features(self, df: pd.DataFrame) -> pd.DataFrame:
         """Generate aggregated features for model performance."""
-        df_agg = df.copy()
         service_columns = [col for col in df.columns if 'service' in col.lower() or 
-                         col in ['PhoneService', 'MultipleLines', 'InternetService',
-                                 'OnlineSecurity', 'OnlineBackup', 'DeviceProtection', 
-                                 'TechSupport', 'StreamingTV', 'StreamingMovies']]
+                         col in ['PhoneService_encoded', 'MultipleLines_encoded', 'InternetService_encoded',
+                                 'OnlineSecurity_encoded', 'OnlineBackup_encoded', 'DeviceProtection_encoded', 
+                                 'TechSupport_encoded', 'StreamingTV_encoded', 'StreamingMovies_encoded']]
         if service_columns:
-            df_agg['total_services'] = df[service_columns].sum(axis=1)
-            df_agg['service_density'] = df_agg['total_services'] / (df_agg['tenure'] + 1)
-        df_agg['customer_value_segment'] = pd.cut(df_agg['TotalCharges'], 
-                                                bins=4, labels=[0, 1, 2, 3]).astype(int)
-        df_agg['tenure_stability'] = np.where(df_agg['tenure'] <= 12, 0,
-                                    np.where(df_agg['tenure'] <= 36, 1,
-                                    np.where(df_agg['tenure'] <= 60, 2, 3)))
-        if 'PaymentMethod' in df.columns:
-            df_agg['high_risk_payment'] = (df_agg['PaymentMethod'] == 2).astype(int)
+            df['total_services'] = df[service_columns].sum(axis=1)
+            df['service_density'] = df['total_services'] / (df['tenure'] + 1)
+        # Four equal-width TotalCharges bins (same edges as pd.cut(bins=4))
+        total = df['TotalCharges'].to_numpy()
+        value_edges = np.linspace(np.nanmin(total), np.nanmax(total), 5)[1:-1]
+        df['customer_value_segment'] = np.digitize(total, value_edges, right=True).astype(np.int8)
+        # Buckets: <=12, <=36, <=60, >60 months
+        df['tenure_stability'] = np.digitize(df['tenure'].to_numpy(), [12, 36, 60], right=True).astype(np.int8)
+        if 'PaymentMethod_encoded' in df.columns:
+            # Code 2 is 'Electronic check'
+            df['high_risk_payment'] = (df['PaymentMethod_encoded'] == 2).astype(int)
         logger.info("Aggregated features created")
-        return df_agg
+        return df
 
     def apply_feature_scaling(self, df: pd.DataFrame, features_to_scale: list = None) -> pd.DataFrame:
         """Apply StandardScaler and MinMaxScaler to numerical features."""
-        df_scaled = df.copy()
         if features_to_scale is None:
             numerical_features = df.select_dtypes(include=[np.number]).columns.tolist()
             features_to_scale = [col for col in numerical_features if 
@@ -129,49 +147,89 @@ class DataTransformationStorage:
                                col not in ['Churn', 'tenure_group', 'customer_value_segment']]
         standard_features = [col for col in ['tenure', 'MonthlyCharges', 'TotalCharges'] if col in features_to_scale]
         if standard_features:
-            df_scaled[standard_features] = self.standard_scaler.fit_transform(df_scaled[standard_features])
+            df[standard_features] = self.standard_scaler.fit_transform(df[standard_features])
             logger.info(f"Standard scaled: {standard_features}")
         minmax_features = [col for col in features_to_scale if col not in standard_features]
         if minmax_features:
-            df_scaled[minmax_features] = self.minmax_scaler.fit_transform(df_scaled[minmax_features])
+            df[minmax_features] = self.minmax_scaler.fit_transform(df[minmax_features])
             logger.info(f"Min-max scaled: {minmax_features}")
-        return df_scaled
+        return df
 
     def create_feature_interactions(self, df: pd.DataFrame) -> pd.DataFrame:
         """Generate interaction features between key variables."""
-        df_interact = df.copy()
-        df_interact['tenure_monthly_interaction'] = df_interact['tenure'] * df_interact['MonthlyCharges']
-        df_interact['tenure_total_interaction'] = df_interact['tenure'] * df_interact['TotalCharges']
+        pairs = [('tenure_monthly_interaction', 'tenure', 'MonthlyCharges'),
+                 ('tenure_total_interaction', 'tenure', 'TotalCharges')]
         if 'total_services' in df.columns:
-            df_interact['services_charges_interaction'] = df_interact['total_services'] * df_interact['MonthlyCharges']
-        if 'Contract' in df.columns and 'PaymentMethod' in df.columns:
-            df_interact['contract_payment_interaction'] = df_interact['Contract'] * df_interact['PaymentMethod']
+            pairs.append(('services_charges_interaction', 'total_services', 'MonthlyCharges'))
+        if 'Contract_encoded' in df.columns and 'PaymentMethod_encoded' in df.columns:
+            pairs.append(('contract_payment_interaction', 'Contract_encoded', 'PaymentMethod_encoded'))
+        # Pull each source column once as float32 and write every product into one (n, k) buffer
+        sources = {col: df[col].to_numpy(dtype=np.float32)
+                   for _, left, right in pairs for col in (left, right)}
+        out = np.empty((len(df), len(pairs)), dtype=np.float32, order='F')
+        for j, (_, left, right) in enumerate(pairs):
+            np.multiply(sources[left], sources[right], out=out[:, j])
+        for j, (name, _, _) in enumerate(pairs):
+            df[name] = out[:, j]
         logger.info("Interaction features created")
-        return df_interact
+        return df
 
     def store_transformed_data(self, df: pd.DataFrame, table_name: str = "customer_features") -> None:
         """Store transformed data in SQLite database."""
         df = df.rename(columns={'customerID': 'customer_id'}, errors='ignore')
-        timestamp = datetime.now().isoformat()
-        df['created_timestamp'] = df.get('created_timestamp', timestamp)
+        timestamp = self._now().isoformat()
+        df['created_timestamp'] = timestamp
         df['updated_timestamp'] = timestamp
-        df.to_sql(table_name, self.conn, if_exists='replace', index=False)
+        self._ensure_table_columns(table_name, df)
+        # Upsert into the keyed schema so the table and its indexes survive across runs;
+        # existing customers keep their original created_timestamp
+        columns = ", ".join(f'"{col}"' for col in df.columns)
+        placeholders = ", ".join("?" * len(df.columns))
+        updates = ", ".join(f'"{col}" = excluded."{col}"' for col in df.columns
+                            if col not in ('customer_id', 'created_timestamp'))
+        stmt = (f'INSERT INTO "{table_name}" ({columns}) VALUES ({placeholders}) '
+                f'ON CONFLICT(customer_id) DO UPDATE SET {updates}')
+        rows = df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+        with self.conn:
+            self.conn.executemany(stmt, rows)
         logger.info(f"Stored data in {table_name}")
         self.update_feature_metadata(df)
 
+    def _ensure_table_columns(self, table_name: str, df: pd.DataFrame) -> None:
+        """Make sure the target table exists, is keyed, and has a column for every frame column."""
+        info = self.conn.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+        if info and not any(row[5] for row in info):
+            # Legacy table written by to_sql(if_exists='replace'): recreate with the keyed schema
+            logger.info(f"Recreating legacy table {table_name} without primary key")
+            self.conn.execute(f'DROP TABLE "{table_name}"')
+            self.setup_database()
+            info = self.conn.execute(f'PRAGMA table_info("{table_name}")').fetchall()
+        if not info:
+            df.head(0).to_sql(table_name, self.conn, index=False)
+            return
+        existing = {row[1] for row in info}
+        missing = [col for col in df.columns if col not in existing]
+        for col in missing:
+            self.conn.execute(f'ALTER TABLE "{table_name}" ADD COLUMN "{col}"')
+        if missing:
+            self.conn.commit()
+            logger.info(f"Added columns to {table_name}: {missing}")
+
     def update_feature_metadata(self, df: pd.DataFrame) -> None:
         """Update feature metadata in SQLite table."""
-        cursor = self.conn.cursor()
-        for column in df.columns:
-            if column not in ['created_timestamp', 'updated_timestamp']:
-                feature_type = 'categorical' if '_encoded' in column else 'numerical'
-                cursor.execute("""
-                    INSERT OR REPLACE INTO feature_metadata 
-                    (feature_name, feature_type, description, transformation_applied, created_date)
-                    VALUES (?, ?, ?, ?, ?)
-                """, (column, feature_type, f"Feature: {column}", 
-                     "StandardScaler/LabelEncoder", datetime.now().isoformat()))
-        self.conn.commit()
+        created_date = self._now().isoformat()
+        rows = [
+            (column, 'categorical' if '_encoded' in column else 'numerical',
+             f"Feature: {column}", "StandardScaler/LabelEncoder", created_date)
+            for column in df.columns
+            if column not in ['created_timestamp', 'updated_timestamp']
+        ]
+        with self.conn:
+            self.conn.executemany("""
+                INSERT OR REPLACE INTO feature_metadata 
+                (feature_name, feature_type, description, transformation_applied, created_date)
+                VALUES (?, ?, ?, ?, ?)
+            """, rows)
         logger.info("Feature metadata updated")
 
     def create_training_set(self, set_name: str, feature_columns: list = None) -> tuple[str, str]:
@@ -180,13 +238,14 @@ class DataTransformationStorage:
         df = pd.read_sql(query, self.conn)
         data_quality_score = self.calculate_data_quality_score(df)
         target_distribution = str(df['Churn'].value_counts().to_dict()) if 'Churn' in df.columns else "No target"
-        set_id = f"{set_name}_{datetime.now().strftime('%Y%m%d_%H%M%S')}"
+        run_time = self._now()
+        set_id = f"{set_name}_{run_time.strftime('%Y%m%d_%H%M%S')}"
         cursor = self.conn.cursor()
         cursor.execute("""
             INSERT INTO training_sets 
             (set_id, set_name, creation_date, feature_count, record_count, target_distribution, data_quality_score)
             VALUES (?, ?, ?, ?, ?, ?, ?)
-        """, (set_id, set_name, datetime.now().isoformat(), 
+        """, (set_id, set_name, run_time.isoformat(), 
               len(df.columns), len(df), target_distribution, data_quality_score))
         self.conn.commit()
         output_path = f"data/processed/training_sets/{set_id}.csv"
@@ -209,33 +268,54 @@ class DataTransformationStorage:
     def run_transformation_pipeline(self, input_df: pd.DataFrame) -> tuple[pd.DataFrame, str]:
         """Run full transformation pipeline and store results."""
         logger.info("Starting transformation pipeline")
-        df = self.create_aggregated_features(input_df)
-        df = self.create_feature_interactions(df)
-        df = self.apply_feature_scaling(df)
-        self.store_transformed_data(df)
-        set_id, training_path = self.create_training_set("churn_prediction_v1")
+        # One timestamp for every table touched in this run
+        self._run_time = datetime.now()
+        try:
+            # Single defensive copy; the stages below mutate the frame in place
+            df = self.create_aggregated_features(input_df.copy())
+            df = self.create_feature_interactions(df)
+            df = self.apply_feature_scaling(df)
+            self.store_transformed_data(df)
+            set_id, training_path = self.create_training_set("churn_prediction_v1")
+        finally:
+            self._run_time = None
         logger.info("Transformation pipeline completed")
         return df, training_path
 
     def run_transformation_pipeline_auto(self) -> tuple[pd.DataFrame, str]:
-        """Run pipeline with automatic CSV file detection."""
-        patterns = ["data/cleaned/*.csv", "data/processed/*.csv"]
-        csv_files = []
-        for pattern in patterns:
-            csv_files.extend(glob.glob(pattern))
-        if not csv_files:
-            raise FileNotFoundError("No CSV files found in data/cleaned or data/processed")
-        latest_csv = max(csv_files, key=os.path.getmtime)
-        logger.info(f"Using latest CSV: {latest_csv}")
-        df = pd.read_csv(latest_csv)
+        """Run pipeline on the latest cleaned file (Parquet or CSV)."""
+        latest_file = find_latest_cleaned_file()
+        logger.info(f"Using latest cleaned file: {latest_file}")
+        if latest_file.endswith(".parquet"):
+            df = pd.read_parquet(latest_file)
+        else:
+            df = pd.read_csv(latest_file, dtype=CLEANED_DTYPES, engine='c')
         return self.run_transformation_pipeline(df)
 
     def close_connection(self) -> None:
-        """Close SQLite database connection."""
+        """Checkpoint the WAL into the main database file and close the connection."""
         if self.conn:
+            # Fold the -wal file back into churn_data.db so versioning sees one complete file
+            self.conn.execute("PRAGMA wal_checkpoint(TRUNCATE)")
             self.conn.close()
+            self.conn = None
             logger.info("Database connection closed")
 
+def find_latest_cleaned_file() -> str:
+    """
+    Find the most recent cleaned file in data/cleaned or data/processed.
+
+    Returns a .parquet path when any Parquet file exists (data preparation writes
+    Parquet when pyarrow is installed), otherwise the newest .csv path.
+    """
+    for ext in ("parquet", "csv"):
+        files = []
+        for folder in ("data/cleaned", "data/processed"):
+            files.extend(glob.glob(f"{folder}/*.{ext}"))
+        if files:
+            return max(files, key=os.path.getmtime)
+    raise FileNotFoundError("No cleaned Parquet or CSV files found in data/cleaned or data/processed")
+
 if __name__ == "__main__":
     import sys
     print("=" * 60)
@@ -10,121 +10,312 @@ Generates an Excel report summarizing findings. If one source is missing,
 the report is created for the available source.
 """
 import pandas as pd
+import numpy as np
 import os
 from datetime import datetime
-import glob
+import json
+import hashlib
+import mmap
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 
 from utils.logger import get_logger, PIPELINE_NAMES
 
+# Optional: orjson for the HF rows dump when simdjson is not installed
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional: SIMD JSON parser for the HF rows dump
+try:
+    import simdjson
+    SIMDJSON_AVAILABLE = True
+except ImportError:
+    SIMDJSON_AVAILABLE = False
+
+# Optional: write-only streaming Excel engine (falls back to openpyxl)
+try:
+    import xlsxwriter
+    EXCEL_ENGINE = 'xlsxwriter'
+except ImportError:
+    EXCEL_ENGINE = 'openpyxl'
+
+# Optional: Polars lazy CSV validation (fused single-pass aggregates), opt-in via env var
+try:
+    import polars as pl
+    POLARS_AVAILABLE = True
+except ImportError:
+    POLARS_AVAILABLE = False
+USE_POLARS = POLARS_AVAILABLE and os.environ.get('CHURN_VALIDATION_POLARS', '0') == '1'
+
+# Optional: multithreaded Arrow CSV parser and Arrow IPC hand-off cache
+try:
+    import pyarrow as pa
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+# Machine-local cache (gitignored): never under reports/, which version_pipeline_step commits
+ARROW_CACHE_DIR = os.path.join('data', '.cache', 'arrow')
+ARROW_CACHE_KEEP = 2  # newest cache files kept per source file
+
+
+def _arrow_cache_prefix(path):
+    """Cache file name prefix shared by every cached version of one source file"""
+    return hashlib.sha1(os.path.abspath(path).encode()).hexdigest()[:16]
+
+
+def get_arrow_cache_path(path):
+    """Arrow IPC cache file for a source file, keyed by its absolute path and mtime"""
+    st = os.stat(path)
+    return os.path.join(ARROW_CACHE_DIR, f"{_arrow_cache_prefix(path)}-{st.st_mtime_ns}.arrow")
+
+
+def _evict_arrow_cache(path, keep=ARROW_CACHE_KEEP):
+    """Delete all but the newest `keep` cached versions of a source file"""
+    prefix = f"{_arrow_cache_prefix(path)}-"
+    with os.scandir(ARROW_CACHE_DIR) as it:
+        entries = [e for e in it if e.name.startswith(prefix) and e.name.endswith('.arrow')]
+    entries.sort(key=lambda e: int(e.name[len(prefix):-len('.arrow')]), reverse=True)
+    for entry in entries[keep:]:
+        try:
+            os.remove(entry.path)
+        except OSError:
+            pass
+
 # Get logger for this pipeline
 logger = get_logger(PIPELINE_NAMES['DATA_VALIDATION'])
 
+# On-disk memo of validation results, keyed by file identity (path, size, mtime);
+# machine-local, so it lives in the gitignored data/.cache rather than the committed reports/
+VALIDATION_CACHE_PATH = os.path.join('data', '.cache', 'validation_cache.json')
+VALIDATION_CACHE_SIZE = 32
+# Bump when _validate_df (or the checks it runs) changes its results; cached
+# entries are only invalidated by a change to the file itself otherwise
+VALIDATION_CACHE_VERSION = 1
+
+# Decorator: skip re-validating a file whose path, size, and mtime are unchanged
+def _cached_by_file_stat(method):
+    """Memoize a validator on (abspath, size, mtime_ns) in a small LRU cache persisted to JSON.
+
+    The key also carries VALIDATION_CACHE_VERSION and the engine (Polars or pandas),
+    whose results differ in their data_types strings.
+    """
+    @functools.wraps(method)
+    def wrapper(self, path):
+        st = os.stat(path)
+        engine = 'polars' if USE_POLARS else 'pandas'
+        key = (f"v{VALIDATION_CACHE_VERSION}|{engine}|"
+               f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}")
+        with self._cache_lock:
+            cache = self._load_validation_cache()
+            if key in cache:
+                cache[key] = cache.pop(key)  # mark as most recently used
+                logger.info(f"Validation cache hit: {path}")
+                return cache[key]
+        results = method(self, path)
+        with self._cache_lock:
+            cache[key] = results
+            while len(cache) > VALIDATION_CACHE_SIZE:
+                cache.pop(next(iter(cache)))
+            self._save_validation_cache()
+        return results
+    return wrapper
+
 # Class: validates raw CSV/JSON data and emits an Excel quality report
 class DataValidator:
     """Validator for raw data files to ensure minimum quality before prep."""
     def __init__(self, raw_data_path="data/raw"):
         self.raw_data_path = raw_data_path
         os.makedirs('reports', exist_ok=True)
+        self._validation_cache = None
+        self._cache_lock = threading.Lock()
+
+    # Load the validation cache from disk once per validator
+    def _load_validation_cache(self):
+        if self._validation_cache is None:
+            try:
+                with open(VALIDATION_CACHE_PATH, 'r') as f:
+                    self._validation_cache = json.load(f)
+            except (OSError, ValueError):
+                self._validation_cache = {}
+        return self._validation_cache
+
+    # Persist the validation cache atomically
+    def _save_validation_cache(self):
+        os.makedirs(os.path.dirname(VALIDATION_CACHE_PATH), exist_ok=True)
+        tmp_path = f"{VALIDATION_CACHE_PATH}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump(self._validation_cache, f)
+        os.replace(tmp_path, VALIDATION_CACHE_PATH)
+
+    # Shared checks for any loaded frame: missing values, duplicates, dtypes, negatives
+    def _validate_df(self, df, file_name, source):
+        """Compute validation metrics for a DataFrame with vectorized column reductions"""
+        # Numeric columns: one consolidated float64 block, one compare/isnan pass for all of them
+        num_df = df.select_dtypes(include='number')
+        arr = num_df.to_numpy(dtype=np.float64, na_value=np.nan)
+        negatives = dict(zip(num_df.columns, (arr < 0).sum(axis=0)))
+        missing = dict(zip(num_df.columns, np.isnan(arr).sum(axis=0)))
+        # Object/other columns fall back to pandas null detection
+        other_cols = df.columns.difference(num_df.columns, sort=False)
+        missing.update(df[other_cols].isnull().sum().items())
+        missing = {c: missing[c] for c in df.columns}
+        # Duplicates via one uint64 hash per row (8 bytes/row regardless of width)
+        row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+        duplicate_records = len(row_hashes) - len(np.unique(row_hashes))
+        validation_results = {
+            'file_name': file_name,
+            'total_records': len(df),
+            'total_columns': len(df.columns),
+            'missing_values': {c: int(v) for c, v in missing.items() if v > 0},
+            'duplicate_records': int(duplicate_records),
+            'data_types': {c: str(d) for c, d in df.dtypes.items()},
+            'negative_values': {c: int(v) for c, v in negatives.items() if v > 0}
+        }
+        logger.info(f"{source} validation completed: {len(df)} records, {len(df.columns)} columns")
+        return validation_results
+
+    # Persist the parsed frame as Arrow IPC so later stages can mmap it instead of re-parsing
+    def _write_arrow_cache(self, source_path, df):
+        try:
+            os.makedirs(ARROW_CACHE_DIR, exist_ok=True)
+            cache_path = get_arrow_cache_path(source_path)
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            tmp_path = f"{cache_path}.tmp"
+            with pa.OSFile(tmp_path, 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+            os.replace(tmp_path, cache_path)
+            _evict_arrow_cache(source_path)
+        except Exception as e:
+            logger.warning(f"Could not write Arrow cache for {source_path}: {str(e)}")
+
+    # Polars variant of the CSV checks: one lazy query, never materializes the frame
+    def _validate_csv_polars(self, csv_file):
+        """Compute the _validate_df metrics for a CSV with a single streaming Polars scan"""
+        lf = pl.scan_csv(csv_file)
+        schema = lf.collect_schema() if hasattr(lf, 'collect_schema') else lf.schema
+        columns = list(schema.keys())
+        num_cols = [c for c, d in schema.items() if d.is_numeric()]
+        query = lf.select([
+            pl.len().alias('__rows'),
+            (pl.len() - pl.struct(pl.all()).n_unique()).alias('__dups'),
+            *[pl.col(c).null_count().alias(f'null:{c}') for c in columns],
+            *[pl.col(c).lt(0).sum().alias(f'neg:{c}') for c in num_cols],
+        ])
+        try:
+            stats = query.collect(engine='streaming').row(0, named=True)
+        except TypeError:
+            stats = query.collect(streaming=True).row(0, named=True)
+        missing = {c: stats[f'null:{c}'] for c in columns}
+        negatives = {c: stats[f'neg:{c}'] for c in num_cols}
+        validation_results = {
+            'file_name': os.path.basename(csv_file),
+            'total_records': int(stats['__rows']),
+            'total_columns': len(columns),
+            'missing_values': {c: int(v) for c, v in missing.items() if v},
+            'duplicate_records': int(stats['__dups']),
+            'data_types': {c: str(d) for c, d in schema.items()},
+            'negative_values': {c: int(v) for c, v in negatives.items() if v}
+        }
+        logger.info(f"CSV validation completed: {stats['__rows']} records, {len(columns)} columns")
+        return validation_results
 
     # Validate a CSV file: missing values, dtypes, negatives, duplicates
+    @_cached_by_file_stat
     def validate_csv_data(self, csv_file):
         """Validate CSV data file"""
         try:
             logger.info(f"Validating CSV file: {csv_file}")
             
-            df = pd.read_csv(csv_file)
-            
-            validation_results = {
-                'file_name': os.path.basename(csv_file),
-                'total_records': len(df),
-                'total_columns': len(df.columns),
-                'missing_values': {},
-                'duplicate_records': 0,
-                'data_types': {},
-                'negative_values': {}
-            }
-            
-            # Check missing values
-            for column in df.columns:
-                missing_count = df[column].isnull().sum()
-                if missing_count > 0:
-                    validation_results['missing_values'][column] = int(missing_count)
-            
-            # Check duplicates
-            validation_results['duplicate_records'] = int(df.duplicated().sum())
-            
-            # Check data types
-            for column in df.columns:
-                validation_results['data_types'][column] = str(df[column].dtype)
-            
-            # Check negative values in numeric columns
-            numeric_columns = df.select_dtypes(include=['int64', 'float64']).columns
-            for column in numeric_columns:
-                negative_count = (df[column] < 0).sum()
-                if negative_count > 0:
-                    validation_results['negative_values'][column] = int(negative_count)
+            if USE_POLARS:
+                return self._validate_csv_polars(csv_file)
+
+            df = pd.read_csv(csv_file, engine='pyarrow' if PYARROW_AVAILABLE else 'c')
+            if PYARROW_AVAILABLE:
+                self._write_arrow_cache(csv_file, df)
             
-            logger.info(f"CSV validation completed: {len(df)} records, {len(df.columns)} columns")
-            return validation_results
+            return self._validate_df(df, os.path.basename(csv_file), "CSV")
             
         except Exception as e:
             logger.error(f"CSV validation failed: {str(e)}")
             raise
 
     # Validate a JSON file (HF rows format supported)
+    @_cached_by_file_stat
     def validate_json_data(self, json_file):
         """Validate JSON data file"""
         try:
             logger.info(f"Validating JSON file: {json_file}")
             
-            import json
-            with open(json_file, 'r') as f:
-                data = json.load(f)
-            
-            # Extract rows from Hugging Face format
-            if 'rows' in data:
-                rows = data['rows']
-                df = pd.DataFrame([row['row'] for row in rows])
+            if SIMDJSON_AVAILABLE:
+                # Parse into simdjson's lazy document; only the row objects are materialized
+                parser = simdjson.Parser()
+                with open(json_file, 'rb') as f:
+                    doc = parser.parse(f.read())
+                if isinstance(doc, simdjson.Object) and 'rows' in doc:
+                    # HF rows share one flat schema: fill column lists straight from the
+                    # lazy row views instead of building a dict per row
+                    rows = doc['rows']
+                    n_rows = len(rows)
+                    columns = list(rows[0]['row'].keys()) if n_rows else []
+                    data = {c: [None] * n_rows for c in columns}
+                    for i, item in enumerate(rows):
+                        row = item['row']
+                        for c in columns:
+                            if c in row:
+                                data[c][i] = row[c]
+                    df = pd.DataFrame(data, columns=columns)
+                else:
+                    df = pd.DataFrame(doc.as_dict() if isinstance(doc, simdjson.Object) else doc.as_list())
             else:
-                df = pd.DataFrame(data)
-            
-            validation_results = {
-                'file_name': os.path.basename(json_file),
-                'total_records': len(df),
-                'total_columns': len(df.columns),
-                'missing_values': {},
-                'duplicate_records': 0,
-                'data_types': {},
-                'negative_values': {}
-            }
-            
-            # Check missing values
-            for column in df.columns:
-                missing_count = df[column].isnull().sum()
-                if missing_count > 0:
-                    validation_results['missing_values'][column] = int(missing_count)
-            
-            # Check duplicates
-            validation_results['duplicate_records'] = int(df.duplicated().sum())
-            
-            # Check data types
-            for column in df.columns:
-                validation_results['data_types'][column] = str(df[column].dtype)
-            
-            # Check negative values in numeric columns
-            numeric_columns = df.select_dtypes(include=['int64', 'float64']).columns
-            for column in numeric_columns:
-                negative_count = (df[column] < 0).sum()
-                if negative_count > 0:
-                    validation_results['negative_values'][column] = int(negative_count)
+                if ORJSON_AVAILABLE:
+                    # Parse straight from the mapped file bytes; no Python str copy of the file
+                    with open(json_file, 'rb') as f:
+                        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                            with memoryview(mm) as view:
+                                data = orjson.loads(view)
+                else:
+                    with open(json_file, 'r') as f:
+                        data = json.load(f)
+                
+                # Extract rows from Hugging Face format
+                if 'rows' in data:
+                    rows = data['rows']
+                    df = pd.DataFrame([row['row'] for row in rows])
+                else:
+                    df = pd.DataFrame(data)
             
-            logger.info(f"JSON validation completed: {len(df)} records, {len(df.columns)} columns")
-            return validation_results
+            return self._validate_df(df, os.path.basename(json_file), "JSON")
             
         except Exception as e:
             logger.error(f"JSON validation failed: {str(e)}")
             raise
 
+    # Pick the newest raw CSV and HF JSON in one directory pass
+    def _find_latest_raw_files(self):
+        """Return (latest_csv, latest_json) under raw path by ctime; None where absent"""
+        latest = {'csv': (None, -1.0), 'json': (None, -1.0)}
+        with os.scandir(self.raw_data_path) as entries:
+            for entry in entries:
+                name = entry.name
+                if name.startswith('customer_churn_') and name.endswith('.csv'):
+                    kind = 'csv'
+                elif name.startswith('huggingface_churn_') and name.endswith('.json'):
+                    kind = 'json'
+                else:
+                    continue
+                if not entry.is_file():
+                    continue
+                ctime = entry.stat().st_ctime
+                if ctime > latest[kind][1]:
+                    latest[kind] = (entry.path, ctime)
+        return latest['csv'][0], latest['json'][0]
+
     # Run validation on latest available CSV/JSON under raw path
     def run_validation(self):
         """Run validation on all data files"""
@@ -132,19 +323,17 @@ class DataValidator:
             logger.info("Starting data validation pipeline...")
             
             # Find latest data files
-            csv_files = glob.glob(os.path.join(self.raw_data_path, "customer_churn_*.csv"))
-            json_files = glob.glob(os.path.join(self.raw_data_path, "huggingface_churn_*.json"))
+            latest_csv, latest_json = self._find_latest_raw_files()
             
-            if not csv_files and not json_files:
+            if not latest_csv and not latest_json:
                 raise Exception("No data files found for validation")
             
-            # Get latest files
-            latest_csv = max(csv_files, key=os.path.getctime) if csv_files else None
-            latest_json = max(json_files, key=os.path.getctime) if json_files else None
-            
-            # Validate both files
-            csv_results = self.validate_csv_data(latest_csv) if latest_csv else None
-            json_results = self.validate_json_data(latest_json) if latest_json else None
+            # Validate both files concurrently; they share no data
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                csv_future = executor.submit(self.validate_csv_data, latest_csv) if latest_csv else None
+                json_future = executor.submit(self.validate_json_data, latest_json) if latest_json else None
+                csv_results = csv_future.result() if csv_future else None
+                json_results = json_future.result() if json_future else None
             
             # Generate report
             report_path = self.generate_validation_report(csv_results, json_results)
@@ -169,68 +358,48 @@ class DataValidator:
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             report_path = f"reports/data_quality_report_{timestamp}.xlsx"
             
-            with pd.ExcelWriter(report_path, engine='openpyxl') as writer:
-                
-                # Summary sheet
-                sources = []
-                if csv_results:
-                    sources.append(('CSV File', csv_results))
-                if json_results:
-                    sources.append(('JSON File', json_results))
-
-                summary_data = {
-                    'Data Source': [s[0] for s in sources],
-                    'File Name': [s[1]['file_name'] for s in sources],
-                    'Total Records': [s[1]['total_records'] for s in sources],
-                    'Total Columns': [s[1]['total_columns'] for s in sources],
-                    'Missing Values Count': [len(s[1]['missing_values']) for s in sources],
-                    'Duplicate Records': [s[1]['duplicate_records'] for s in sources],
-                    'Negative Values Count': [len(s[1]['negative_values']) for s in sources]
-                }
-                summary_df = pd.DataFrame(summary_data)
-                summary_df.to_excel(writer, sheet_name='Summary', index=False)
-                
-                # Missing values sheet
-                missing_data = []
-                for source, results in [(n, r) for n, r in [('CSV', csv_results), ('JSON', json_results)] if r]:
-                    for column, count in results['missing_values'].items():
-                        missing_data.append({
-                            'Source': source,
-                            'Column': column,
-                            'Missing Count': count,
-                            'Percentage': round((count / results['total_records']) * 100, 2)
-                        })
-                
-                if missing_data:
-                    missing_df = pd.DataFrame(missing_data)
-                    missing_df.to_excel(writer, sheet_name='Missing Values', index=False)
-                
-                # Data types sheet
-                dtype_data = []
-                for source, results in [(n, r) for n, r in [('CSV', csv_results), ('JSON', json_results)] if r]:
-                    for column, dtype in results['data_types'].items():
-                        dtype_data.append({
-                            'Source': source,
-                            'Column': column,
-                            'Data Type': dtype
-                        })
-                
-                dtype_df = pd.DataFrame(dtype_data)
-                dtype_df.to_excel(writer, sheet_name='Data Types', index=False)
-                
-                # Negative values sheet
-                negative_data = []
-                for source, results in [(n, r) for n, r in [('CSV', csv_results), ('JSON', json_results)] if r]:
-                    for column, count in results['negative_values'].items():
-                        negative_data.append({
-                            'Source': source,
-                            'Column': column,
-                            'Negative Count': count
-                        })
-                
-                if negative_data:
-                    negative_df = pd.DataFrame(negative_data)
-                    negative_df.to_excel(writer, sheet_name='Negative Values', index=False)
+            # Summary and detail rows for every source, collected in one pass
+            summary_data, missing_data, dtype_data, negative_data = [], [], [], []
+            for source, results in (('CSV', csv_results), ('JSON', json_results)):
+                if not results:
+                    continue
+                summary_data.append((f"{source} File", results['file_name'], results['total_records'],
+                                     results['total_columns'], len(results['missing_values']),
+                                     results['duplicate_records'], len(results['negative_values'])))
+                total_records = results['total_records']
+                for column, count in results['missing_values'].items():
+                    missing_data.append((source, column, count, round((count / total_records) * 100, 2)))
+                for column, dtype in results['data_types'].items():
+                    dtype_data.append((source, column, dtype))
+                for column, count in results['negative_values'].items():
+                    negative_data.append((source, column, count))
+
+            # (sheet name, header, rows); empty missing/negative sheets are omitted
+            sheets = [
+                ('Summary', ['Data Source', 'File Name', 'Total Records', 'Total Columns',
+                             'Missing Values Count', 'Duplicate Records', 'Negative Values Count'], summary_data),
+                ('Missing Values', ['Source', 'Column', 'Missing Count', 'Percentage'], missing_data),
+                ('Data Types', ['Source', 'Column', 'Data Type'], dtype_data),
+                ('Negative Values', ['Source', 'Column', 'Negative Count'], negative_data),
+            ]
+            sheets = [sheet for sheet in sheets
+                      if sheet[2] or sheet[0] not in ('Missing Values', 'Negative Values')]
+
+            if EXCEL_ENGINE == 'xlsxwriter':
+                # Stream rows straight into the workbook; no intermediate DataFrames
+                workbook = xlsxwriter.Workbook(report_path, {'constant_memory': True})
+                try:
+                    for sheet_name, header, rows in sheets:
+                        worksheet = workbook.add_worksheet(sheet_name)
+                        worksheet.write_row(0, 0, header)
+                        for i, row in enumerate(rows, 1):
+                            worksheet.write_row(i, 0, row)
+                finally:
+                    workbook.close()
+            else:
+                with pd.ExcelWriter(report_path, engine='openpyxl') as writer:
+                    for sheet_name, header, rows in sheets:
+                        pd.DataFrame(rows, columns=header).to_excel(writer, sheet_name=sheet_name, index=False)
             
             logger.info(f"Validation report generated: {report_path}")
             return report_path
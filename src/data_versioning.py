@@ -6,6 +6,8 @@ Standard DVC approach for data versioning in the churn prediction pipeline.
 
 import os
 import subprocess
+import threading
+import time
 from datetime import datetime
 from typing import Dict, List, Optional, Union
 import json
@@ -15,38 +17,94 @@ from utils.logger import get_logger, PIPELINE_NAMES
 # Get logger for this pipeline
 logger = get_logger(PIPELINE_NAMES['DATA_VERSIONING'])
 
+# Optional: in-process DVC and Git APIs (each falls back to its CLI when unavailable)
+try:
+    from dvc.repo import Repo as DvcRepo
+    DVC_API_AVAILABLE = True
+except ImportError:
+    DVC_API_AVAILABLE = False
+
+try:
+    from git import Repo as GitRepo
+    GITPYTHON_AVAILABLE = True
+except ImportError:
+    GITPYTHON_AVAILABLE = False
+
+# Directories never containing user .dvc files; pruned from the tracked-file scan
+_SKIP_DIRS = {'.git', '.dvc', '.venv', 'venv', '__pycache__', 'node_modules'}
+TRACKED_FILES_TTL_SEC = 5.0
+
 
 class DVCVersioning:
     """DVC-based data versioning system for churn prediction pipeline."""
 
+    # setup_dvc succeeded once in this process; later instances skip the checks
+    _setup_done = False
+
     def __init__(self):
         """Initialize DVC versioning system."""
+        self._tracked_files = None
+        self._tracked_files_at = 0.0
+        self._dvc_repo = None
+        self._git_repo = None
         self.setup_dvc()
         logger.info("DVC versioning system initialized")
 
+    def _dvc(self):
+        """In-process DVC repo handle, or None to use the dvc CLI."""
+        if self._dvc_repo is None and DVC_API_AVAILABLE and os.path.exists('.dvc'):
+            try:
+                self._dvc_repo = DvcRepo('.')
+            except Exception as e:
+                logger.warning("DVC API unavailable, using CLI: %s", str(e))
+                self._dvc_repo = False
+        return self._dvc_repo or None
+
+    def _git(self):
+        """In-process Git repo handle, or None to use the git CLI."""
+        if self._git_repo is None and GITPYTHON_AVAILABLE:
+            try:
+                self._git_repo = GitRepo('.')
+            except Exception as e:
+                logger.warning("GitPython unavailable, using CLI: %s", str(e))
+                self._git_repo = False
+        return self._git_repo or None
+
     def setup_dvc(self) -> bool:
         """Set up DVC for data versioning."""
+        if DVCVersioning._setup_done:
+            return True
         try:
-            # Check if DVC is installed
-            result = subprocess.run(
-                ['dvc', '--version'],
-                capture_output=True,
-                text=True,
-                check=False
-            )
-            if result.returncode != 0:
-                logger.error("DVC not installed. Install with: pip install dvc")
-                return False
+            # Check if DVC is installed (importable API implies it is)
+            if not DVC_API_AVAILABLE:
+                result = subprocess.run(
+                    ['dvc', '--version'],
+                    capture_output=True,
+                    text=True,
+                    check=False
+                )
+                if result.returncode != 0:
+                    logger.error("DVC not installed. Install with: pip install dvc")
+                    return False
 
             # Initialize DVC if not already done
             if not os.path.exists('.dvc'):
-                subprocess.run(['dvc', 'init'], check=True)
+                if DVC_API_AVAILABLE:
+                    self._dvc_repo = DvcRepo.init('.')
+                else:
+                    subprocess.run(['dvc', 'init'], check=True)
                 logger.info("DVC initialized")
 
             # Configure DVC cache
-            subprocess.run(['dvc', 'config', 'cache.type', 'copy'], check=True)
+            dvc = self._dvc()
+            if dvc is not None:
+                with dvc.config.edit() as conf:
+                    conf.setdefault('cache', {})['type'] = 'copy'
+            else:
+                subprocess.run(['dvc', 'config', 'cache.type', 'copy'], check=True)
             logger.info("DVC cache configured")
 
+            DVCVersioning._setup_done = True
             return True
 
         except subprocess.CalledProcessError as e:
@@ -56,51 +114,82 @@ class DVCVersioning:
             logger.error("DVC setup failed: %s", str(e))
             return False
 
-    def add_data_to_dvc(self, data_path: str) -> bool:
-        """Add data directory or file to DVC tracking."""
+    def add_data_to_dvc(self, data_path: Union[str, List[str]]) -> bool:
+        """Add one or more data directories/files to DVC tracking in a single batch."""
+        paths = [data_path] if isinstance(data_path, str) else list(data_path)
         try:
-            if not os.path.exists(data_path):
-                logger.error("Data path does not exist: %s", data_path)
+            missing = [p for p in paths if not os.path.exists(p)]
+            if missing:
+                logger.error("Data path does not exist: %s", ", ".join(missing))
                 return False
+            if not paths:
+                return True
 
-            # Add to DVC
-            subprocess.run(['dvc', 'add', data_path], check=True)
-            logger.info("Added %s to DVC tracking", data_path)
-
-            # Add .dvc file to git
-            dvc_file = f"{data_path}.dvc"
-            if os.path.exists(dvc_file):
-                subprocess.run(['git', 'add', dvc_file], check=True)
-                logger.info("Added %s to git", dvc_file)
+            # Add to DVC (one call for all paths)
+            dvc = self._dvc()
+            if dvc is not None:
+                dvc.add(paths)
+            else:
+                subprocess.run(['dvc', 'add', *paths], check=True)
+            self._tracked_files = None
+            logger.info("Added %s to DVC tracking", ", ".join(paths))
+
+            # Add .dvc files to git (one call for all paths)
+            dvc_files = [f"{p}.dvc" for p in paths if os.path.exists(f"{p}.dvc")]
+            if dvc_files:
+                git = self._git()
+                if git is not None:
+                    git.index.add(dvc_files)
+                else:
+                    subprocess.run(['git', 'add', *dvc_files], check=True)
+                logger.info("Added %s to git", ", ".join(dvc_files))
 
             return True
 
-        except subprocess.CalledProcessError as e:
-            logger.error("Failed to add %s to DVC: %s", data_path, str(e))
+        except Exception as e:
+            logger.error("Failed to add %s to DVC: %s", ", ".join(paths), str(e))
             return False
 
     def create_version(self, message: str, tag: Optional[str] = None) -> bool:
         """Create a new version with current data state."""
         try:
-            # Add all .dvc files to git
-            subprocess.run(['git', 'add', '*.dvc'], check=True)
-            subprocess.run(['git', 'add', '.dvcignore'], check=False)
-
-            # Commit changes
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
             commit_message = f"Data version {timestamp}: {message}"
-            subprocess.run(['git', 'commit', '-m', commit_message], check=True)
 
-            # Create tag if specified
+            git = self._git()
+            if git is not None:
+                # Stage all .dvc files (plus .dvcignore) and commit in-process
+                paths = [os.path.normpath(p) for p in self._get_tracked_files()]
+                if os.path.exists('.dvcignore'):
+                    paths.append('.dvcignore')
+                if paths:
+                    git.index.add(paths)
+                if git.head.is_valid() and not git.index.diff('HEAD'):
+                    logger.error("Failed to create version: nothing to commit")
+                    return False
+                git.index.commit(commit_message)
+                if tag:
+                    git.create_tag(tag, message=message)
+            else:
+                # Add all .dvc files to git
+                subprocess.run(['git', 'add', '*.dvc'], check=True)
+                subprocess.run(['git', 'add', '.dvcignore'], check=False)
+
+                # Commit changes
+                subprocess.run(['git', 'commit', '-m', commit_message], check=True)
+
+                # Create tag if specified
+                if tag:
+                    subprocess.run(['git', 'tag', '-a', tag, '-m', message], check=True)
+
             if tag:
-                subprocess.run(['git', 'tag', '-a', tag, '-m', message], check=True)
                 logger.info("Created version with tag: %s", tag)
             else:
                 logger.info("Created version: %s", commit_message)
 
             return True
 
-        except subprocess.CalledProcessError as e:
+        except Exception as e:
             logger.error("Failed to create version: %s", str(e))
             return False
 
@@ -112,6 +201,7 @@ class DVCVersioning:
 
             # Checkout DVC data
             subprocess.run(['dvc', 'checkout'], check=True)
+            self._tracked_files = None
 
             logger.info("Checked out version: %s", version)
             return True
@@ -123,23 +213,22 @@ class DVCVersioning:
     def list_versions(self) -> List[Dict]:
         """List all available data versions."""
         try:
-            # Get git log with tags
+            # One git log with unit/record separators carries hash, subject, and date
             result = subprocess.run([
-                'git', 'log', '--oneline', '--decorate', '--grep=Data version'
+                'git', 'log', '--grep=Data version', '--format=%H%x1f%s%x1f%cI%x1e'
             ], capture_output=True, text=True, check=True)
 
             versions = []
-            for line in result.stdout.strip().split('\n'):
-                if line:
-                    parts = line.split(' ', 1)
-                    if len(parts) >= 2:
-                        commit_hash = parts[0]
-                        message = parts[1]
-                        versions.append({
-                            'commit': commit_hash,
-                            'message': message,
-                            'timestamp': self._get_commit_timestamp(commit_hash)
-                        })
+            for record in result.stdout.split('\x1e'):
+                record = record.strip()
+                if not record:
+                    continue
+                commit_hash, message, timestamp = record.split('\x1f')
+                versions.append({
+                    'commit': commit_hash[:7],
+                    'message': message,
+                    'timestamp': timestamp
+                })
 
             return versions
 
@@ -147,16 +236,6 @@ class DVCVersioning:
             logger.error("Failed to list versions: %s", str(e))
             return []
 
-    def _get_commit_timestamp(self, commit_hash: str) -> str:
-        """Get timestamp for a specific commit."""
-        try:
-            result = subprocess.run([
-                'git', 'show', '-s', '--format=%ci', commit_hash
-            ], capture_output=True, text=True, check=True)
-            return result.stdout.strip()
-        except subprocess.CalledProcessError:
-            return "Unknown"
-
     def get_data_status(self) -> Dict:
         """Get current status of DVC-tracked data."""
         try:
@@ -178,13 +257,23 @@ class DVCVersioning:
 
     def _get_tracked_files(self) -> List[str]:
         """Get list of DVC-tracked files."""
+        # Short TTL cache; add_data_to_dvc and checkout_version drop it explicitly
+        now = time.monotonic()
+        if self._tracked_files is not None and now - self._tracked_files_at < TRACKED_FILES_TTL_SEC:
+            return list(self._tracked_files)
         try:
             dvc_files = []
-            for root, dirs, files in os.walk('.'):
-                for file in files:
-                    if file.endswith('.dvc'):
-                        dvc_files.append(os.path.join(root, file))
-            return dvc_files
+            pending = ['.']
+            while pending:
+                with os.scandir(pending.pop()) as entries:
+                    for entry in entries:
+                        if entry.is_dir(follow_symlinks=False):
+                            if entry.name not in _SKIP_DIRS:
+                                pending.append(entry.path)
+                        elif entry.name.endswith('.dvc'):
+                            dvc_files.append(entry.path)
+            self._tracked_files, self._tracked_files_at = dvc_files, now
+            return list(dvc_files)
         except Exception as e:
             logger.error("Failed to get tracked files: %s", str(e))
             return []
@@ -271,9 +360,23 @@ class DVCVersioning:
             return False
 
 
+_VERSIONING_SINGLETON = None
+_VERSIONING_LOCK = threading.Lock()
+
+
+def _get_versioning() -> DVCVersioning:
+    """Return the process-wide DVCVersioning, creating it on first use."""
+    global _VERSIONING_SINGLETON
+    if _VERSIONING_SINGLETON is None:
+        with _VERSIONING_LOCK:
+            if _VERSIONING_SINGLETON is None:
+                _VERSIONING_SINGLETON = DVCVersioning()
+    return _VERSIONING_SINGLETON
+
+
 def setup_pipeline_versioning():
     """Setup DVC versioning for the entire pipeline."""
-    versioning = DVCVersioning()
+    versioning = _get_versioning()
 
     # Setup S3 remote storage if configured
     import os
@@ -290,7 +393,7 @@ def setup_pipeline_versioning():
 
 def version_pipeline_step(step_name: str, description: str):
     """Version data after a pipeline step."""
-    versioning = DVCVersioning()
+    versioning = _get_versioning()
 
     # For pipeline outputs, we don't add them individually to DVC
     # They are managed by the pipeline itself
@@ -1,26 +1,168 @@
 """
 Simple Feature Store for Churn Prediction
 ========================================
-A lightweight feature store implementation that works with CSV data.
+A lightweight feature store implementation backed by Feather v2 (Arrow IPC) files,
+with CSV kept as a legacy/fallback format.
 """
 
 import pandas as pd
+import numpy as np
+import logging
 import os
-import glob
+import shutil
 from datetime import datetime
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Iterator, Optional
+
+# Optional: Feather (Arrow IPC) persistence - typed, memory-mapped loads instead of CSV parsing
+try:
+    import pyarrow as pa
+    import pyarrow.compute as pc
+    import pyarrow.csv as pacsv
+    import pyarrow.dataset as ds
+    import pyarrow.feather as feather
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
 
 from utils.logger import get_logger, PIPELINE_NAMES
 
 # Get logger for this pipeline
 logger = get_logger(PIPELINE_NAMES['FEATURE_STORE'])
 
+# Point-lookup layout: rows are hive-partitioned into ENTITY_BUCKETS buckets by a stable hash of the id
+ENTITY_BUCKETS = 64
+ENTITY_ID_COLUMNS = ('customer_id', 'customerID')
+NON_FEATURE_COLUMNS = ('customerID', 'created_timestamp', 'updated_timestamp', 'entity_bucket')
+TIMESTAMP_COLUMNS = ('created_timestamp', 'updated_timestamp')
+SAMPLE_ROWS = 100
+CSV_BLOCK_SIZE = 64 << 20  # bytes per streamed CSV block
+REBATCH_ROWS = 65536  # rows per written batch / row group
+
+
+# Demonstration record written when no training data exists (timestamps are filled in at write time)
+SAMPLE_FEATURES = {
+    "customerID": "sample_001",
+    "tenure": 12,
+    "MonthlyCharges": 29.99,
+    "TotalCharges": 359.88,
+    "gender_encoded": 0,
+    "SeniorCitizen": 0,
+    "Partner_encoded": 0,
+    "Dependents_encoded": 0,
+    "PhoneService_encoded": 1,
+    "MultipleLines_encoded": 0,
+    "InternetService_encoded": 1,
+    "OnlineSecurity_encoded": 0,
+    "OnlineBackup_encoded": 0,
+    "DeviceProtection_encoded": 0,
+    "TechSupport_encoded": 0,
+    "StreamingTV_encoded": 0,
+    "StreamingMovies_encoded": 0,
+    "Contract_encoded": 0,
+    "PaperlessBilling_encoded": 1,
+    "PaymentMethod_encoded": 0,
+    "Churn": 0,
+    "tenure_group": "1-12",
+    "charges_per_tenure": 2.499,
+    "total_to_monthly_ratio": 12.0,
+    "avg_monthly_charges": 29.99,
+    "total_services": 1,
+    "service_density": 0.083,
+    "customer_value_segment": "Low",
+    "tenure_stability": 1.0,
+    "tenure_monthly_interaction": 359.88,
+    "tenure_total_interaction": 4318.56,
+    "services_charges_interaction": 29.99,
+}
+
+if PYARROW_AVAILABLE:
+    TIMESTAMP_TYPE = pa.timestamp('us')
+    _SAMPLE_TYPES = {"customerID": pa.string(), "tenure_group": pa.string(),
+                     "customer_value_segment": pa.string()}
+    SAMPLE_SCHEMA = pa.schema(
+        [(name, _SAMPLE_TYPES.get(name, pa.float32() if isinstance(value, float) else pa.int32()))
+         for name, value in SAMPLE_FEATURES.items()]
+        + [(name, TIMESTAMP_TYPE) for name in TIMESTAMP_COLUMNS])
+
+
+def _entity_column(columns) -> str:
+    """Return the entity id column present in columns (training sets use customer_id, raw data customerID)."""
+    return next((c for c in ENTITY_ID_COLUMNS if c in columns), ENTITY_ID_COLUMNS[0])
+
+
+def _entity_buckets(ids) -> np.ndarray:
+    """Bucket ids with pandas' seeded hash; unlike hash(), it is stable across processes."""
+    hashes = pd.util.hash_pandas_object(pd.Series(ids, dtype=object).astype(str), index=False).to_numpy()
+    return (hashes % ENTITY_BUCKETS).astype(np.int32)
+
+
+def _add_timestamp_columns(data, now: datetime):
+    """Append the bookkeeping timestamp columns a Table or RecordBatch does not already carry.
+
+    The column is one np.full of datetime64[us] handed to Arrow as-is, rather than
+    a Python datetime per row.
+    """
+    missing = [name for name in TIMESTAMP_COLUMNS if name not in data.schema.names]
+    if not missing:
+        return data
+    stamp = pa.array(np.full(data.num_rows, np.datetime64(now, 'us')), type=TIMESTAMP_TYPE)
+    if isinstance(data, pa.Table):
+        for name in missing:
+            data = data.append_column(name, stamp)
+        return data
+    return pa.RecordBatch.from_arrays(data.columns + [stamp] * len(missing),
+                                      names=data.schema.names + missing)
+
+
+def _rebatch(batches, target_rows: int = REBATCH_ROWS):
+    """Coalesce a stream of RecordBatches into target_rows-sized batches; only the last may be short."""
+    pending, pending_rows = [], 0
+    for batch in batches:
+        if batch.num_rows == 0:
+            continue
+        pending.append(batch)
+        pending_rows += batch.num_rows
+        if pending_rows >= target_rows:
+            combined = pa.Table.from_batches(pending).combine_chunks().to_batches()[0]
+            offset = 0
+            while pending_rows - offset >= target_rows:
+                yield combined.slice(offset, target_rows)
+                offset += target_rows
+            pending = [combined.slice(offset)] if offset < pending_rows else []
+            pending_rows -= offset
+    if pending:
+        yield pa.Table.from_batches(pending).combine_chunks().to_batches()[0]
+
+
+def _select_feature_columns(columns, feature_names: Optional[List[str]]) -> List[str]:
+    """Requested feature columns that exist, or every non-bookkeeping column when none are requested."""
+    if feature_names:
+        return [col for col in feature_names if col in columns]
+    return [col for col in columns if col not in NON_FEATURE_COLUMNS]
+
+
 class SimpleChurnFeatureStore:
     """Simple feature store for managing churn prediction features."""
     
-    def __init__(self, store_path="data/feature_store"):
-        """Initialize the simple feature store."""
+    def __init__(self, store_path="data/feature_store", legacy_csv=False):
+        """Initialize the simple feature store.
+
+        legacy_csv also writes churn_features.csv next to the Feather file; it is
+        always on when pyarrow is not installed.
+        """
         self.store_path = store_path
+        self.legacy_csv = legacy_csv or not PYARROW_AVAILABLE
+        self.arrow_path = os.path.join(store_path, "churn_features.arrow")
+        self.csv_path = os.path.join(store_path, "churn_features.csv")
+        self.parquet_path = os.path.join(store_path, "churn_features.parquet")
+        self.index_path = os.path.join(store_path, "churn_features_index.arrow")
+        # In-process copy of the feature table, keyed by (path, mtime_ns) of the file it came from
+        self._cache = None
+        self._cache_key = None
+        # entity id -> row number in the Feather table, keyed the same way
+        self._index = None
+        self._index_key = None
         os.makedirs(store_path, exist_ok=True)
         os.makedirs(os.path.join(store_path, "offline_store"), exist_ok=True)
         
@@ -38,16 +180,19 @@ class SimpleChurnFeatureStore:
             return None
         
         try:
-            # Find all CSV files in training_sets directory
-            csv_files = glob.glob(os.path.join(training_sets_dir, "*.csv"))
-            if not csv_files:
+            # One directory read; DirEntry.stat() caches, so each file is stat'ed once
+            with os.scandir(training_sets_dir) as it:
+                latest = max(
+                    (e for e in it if e.name.endswith('.csv') and not e.name.startswith('.') and e.is_file()),
+                    key=lambda e: e.stat().st_mtime,
+                    default=None,
+                )
+            if latest is None:
                 logger.warning("No CSV files found in %s", training_sets_dir)
                 return None
             
-            # Get the latest file by modification time
-            latest_file = max(csv_files, key=os.path.getmtime)
-            logger.info("Found latest training data: %s", latest_file)
-            return latest_file
+            logger.info("Found latest training data: %s", latest.path)
+            return latest.path
         
         except Exception as e:
             logger.error("Error finding latest training data: %s", str(e))
@@ -59,31 +204,127 @@ class SimpleChurnFeatureStore:
         
         try:
             # Ensure required timestamps are present
-            if 'created_timestamp' not in df.columns:
-                df['created_timestamp'] = datetime.now()
-            if 'updated_timestamp' not in df.columns:
-                df['updated_timestamp'] = datetime.now()
-            
-            # Save to CSV
-            csv_path = os.path.join(self.store_path, "churn_features.csv")
-            df.to_csv(csv_path, index=False)
+            now = datetime.now()
+            if PYARROW_AVAILABLE:
+                tbl = _add_timestamp_columns(pa.Table.from_pandas(df, preserve_index=False), now)
+                self.populate_from_table(tbl, entity_id_col)
+            else:
+                for name in TIMESTAMP_COLUMNS:
+                    if name not in df.columns:
+                        df[name] = now
+                df.to_csv(self.csv_path, index=False)
+                df.head(SAMPLE_ROWS).to_csv(os.path.join(self.store_path, "churn_features_sample.csv"), index=False)
+                logger.info("Saved sample data with %d records", min(len(df), SAMPLE_ROWS))
             logger.info("Populated feature store with %d records", len(df))
             
-            # Also save a sample for quick access
-            sample_path = os.path.join(self.store_path, "churn_features_sample.csv")
-            df.head(100).to_csv(sample_path, index=False)
-            logger.info("Saved sample data with 100 records")
-            
         except Exception as e:
             logger.error("Failed to populate feature store: %s", str(e))
             raise RuntimeError(f"Feature store population failed: {str(e)}")
 
+    def populate_from_table(self, tbl, entity_id_col: str = 'customerID'):
+        """Write an Arrow Table (timestamps already present) to every store file and seed the cache."""
+        feather.write_feather(tbl, self.arrow_path, compression="zstd")
+        if self.legacy_csv:
+            pacsv.write_csv(tbl, self.csv_path)
+        # Zero-copy view over the table's buffers; only the sample's own file is encoded
+        self._write_sample(tbl.slice(0, SAMPLE_ROWS))
+
+        # Rewrite the bucketed dataset from scratch so stale partitions never linger
+        shutil.rmtree(self.parquet_path, ignore_errors=True)
+        if entity_id_col in tbl.column_names:
+            ids = tbl.column(entity_id_col).to_numpy(zero_copy_only=False)
+            pq.write_to_dataset(tbl.append_column('entity_bucket', pa.array(_entity_buckets(ids))),
+                                self.parquet_path, partition_cols=['entity_bucket'], compression='zstd')
+            # Reversed so the first occurrence of a duplicated id wins, as the row filter did
+            self._write_index(dict(zip(ids[::-1], range(len(ids) - 1, -1, -1))))
+
+        # Seed the cache with what was just written; the next get_* call skips the reload
+        self._cache = tbl
+        self._cache_key = self._source_key()
+
+    def _write_sample(self, sample):
+        """Write the quick-access sample (an Arrow Table of at most SAMPLE_ROWS rows)."""
+        feather.write_feather(sample, os.path.join(self.store_path, "churn_features_sample.arrow"),
+                              compression="zstd")
+        if self.legacy_csv:
+            pacsv.write_csv(sample, os.path.join(self.store_path, "churn_features_sample.csv"))
+        logger.info("Saved sample data with %d records", sample.num_rows)
+
+    def populate_from_csv(self, csv_file: str) -> int:
+        """Stream a CSV into the store block by block, never materializing a DataFrame.
+
+        Each parsed batch is appended to the Feather file and (with legacy_csv) the CSV,
+        then handed to one streaming Parquet dataset write that keeps a single file per
+        bucket, so peak memory is a block plus at most one pending row group per bucket.
+        """
+        logger.info("Streaming data from: %s", csv_file)
+        reader = pacsv.open_csv(csv_file, read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE))
+        schema = reader.schema
+        for name in TIMESTAMP_COLUMNS:
+            if name not in schema.names:
+                schema = schema.append(pa.field(name, TIMESTAMP_TYPE))
+
+        entity_id_col = next((c for c in ENTITY_ID_COLUMNS if c in schema.names), schema.names[0])
+        entity_idx = schema.get_field_index(entity_id_col)
+        now = datetime.now()
+        sample_batches, sample_rows, total_rows = [], 0, 0
+        index = {}
+
+        def bucketed_batches(writer):
+            """Write each batch to the Feather/CSV outputs, then yield it with its bucket column."""
+            nonlocal sample_rows, total_rows
+            # Parser blocks vary in size; fixed-size batches give evenly sized IPC batches
+            for batch in _rebatch(reader):
+                batch = _add_timestamp_columns(batch, now)
+                writer.write_batch(batch)
+                if csv_writer is not None:
+                    csv_writer.write_batch(batch)
+
+                ids = batch.column(entity_idx)
+                for row, cid in enumerate(ids.to_pylist(), start=total_rows):
+                    index.setdefault(cid, row)
+                if sample_rows < SAMPLE_ROWS:
+                    sample_batches.append(batch.slice(0, SAMPLE_ROWS - sample_rows))
+                    sample_rows += sample_batches[-1].num_rows
+                total_rows += batch.num_rows
+
+                buckets = pa.array(_entity_buckets(ids.to_pandas()), type=pa.int32())
+                yield pa.RecordBatch.from_arrays(batch.columns + [buckets],
+                                                 names=batch.schema.names + ['entity_bucket'])
+
+        shutil.rmtree(self.parquet_path, ignore_errors=True)
+        csv_writer = pacsv.CSVWriter(self.csv_path, schema) if self.legacy_csv else None
+        try:
+            with pa.ipc.new_file(self.arrow_path, schema,
+                                 options=pa.ipc.IpcWriteOptions(compression='zstd')) as writer:
+                # One streaming write for the whole file: rows are buffered per bucket until
+                # a full row group is ready, and each bucket directory gets a single file
+                ds.write_dataset(
+                    bucketed_batches(writer), self.parquet_path, format='parquet',
+                    schema=schema.append(pa.field('entity_bucket', pa.int32())),
+                    partitioning=['entity_bucket'], partitioning_flavor='hive',
+                    min_rows_per_group=REBATCH_ROWS, max_rows_per_group=REBATCH_ROWS,
+                    file_options=ds.ParquetFileFormat().make_write_options(compression='zstd'))
+        finally:
+            if csv_writer is not None:
+                csv_writer.close()
+        self._write_index(index)
+
+        self._write_sample(pa.Table.from_batches(sample_batches, schema=schema))
+
+        logger.info("Populated feature store with %d records", total_rows)
+        return total_rows
+
     def auto_populate_from_latest_data(self):
         """Automatically populate feature store from the latest training data."""
         latest_file = self.find_latest_training_data()
         
         if latest_file:
             try:
+                if PYARROW_AVAILABLE:
+                    n_rows = self.populate_from_csv(latest_file)
+                    return f"Feature store populated with {n_rows} records from {latest_file}"
+
                 logger.info("Loading data from: %s", latest_file)
                 df = pd.read_csv(latest_file)
                 logger.info("Loaded data with shape: %s", df.shape)
@@ -107,85 +348,159 @@ class SimpleChurnFeatureStore:
         """Create sample features for demonstration when no data is available."""
         logger.info("Creating sample feature store")
         
-        sample_data = pd.DataFrame([
-            {
-                "customerID": "sample_001",
-                "tenure": 12,
-                "MonthlyCharges": 29.99,
-                "TotalCharges": 359.88,
-                "gender_encoded": 0,
-                "SeniorCitizen": 0,
-                "Partner_encoded": 0,
-                "Dependents_encoded": 0,
-                "PhoneService_encoded": 1,
-                "MultipleLines_encoded": 0,
-                "InternetService_encoded": 1,
-                "OnlineSecurity_encoded": 0,
-                "OnlineBackup_encoded": 0,
-                "DeviceProtection_encoded": 0,
-                "TechSupport_encoded": 0,
-                "StreamingTV_encoded": 0,
-                "StreamingMovies_encoded": 0,
-                "Contract_encoded": 0,
-                "PaperlessBilling_encoded": 1,
-                "PaymentMethod_encoded": 0,
-                "Churn": 0,
-                "tenure_group": "1-12",
-                "charges_per_tenure": 2.499,
-                "total_to_monthly_ratio": 12.0,
-                "avg_monthly_charges": 29.99,
-                "total_services": 1,
-                "service_density": 0.083,
-                "customer_value_segment": "Low",
-                "tenure_stability": 1.0,
-                "tenure_monthly_interaction": 359.88,
-                "tenure_total_interaction": 4318.56,
-                "services_charges_interaction": 29.99,
-                "created_timestamp": datetime.now(),
-                "updated_timestamp": datetime.now()
-            }
-        ])
-        
         try:
-            self.populate_from_dataframe(sample_data)
+            if PYARROW_AVAILABLE:
+                # Typed columnar batch straight from SAMPLE_SCHEMA: no pandas row-wise inference
+                now = datetime.now()
+                batch = pa.record_batch(
+                    [pa.array([SAMPLE_FEATURES.get(field.name, now)], type=field.type) for field in SAMPLE_SCHEMA],
+                    schema=SAMPLE_SCHEMA)
+                self.populate_from_table(pa.Table.from_batches([batch]))
+            else:
+                self.populate_from_dataframe(pd.DataFrame([SAMPLE_FEATURES]))
             logger.info("Sample feature store created with 1 record")
             return "Sample feature store created with 1 sample record"
         except Exception as e:
             logger.error("Failed to create sample feature store: %s", str(e))
             return f"Error: {str(e)}"
 
+    def _write_index(self, index: Dict[Any, int]):
+        """Persist the entity id -> row map as a two-column Arrow IPC file.
+
+        The schema metadata carries the mtime of the Feather file it indexes; plain
+        columnar data, so reading it back never executes anything (unlike a pickle).
+        """
+        key = (self.arrow_path, os.stat(self.arrow_path).st_mtime_ns)
+        tbl = pa.table({'entity_id': list(index.keys()),
+                        'row': pa.array(list(index.values()), type=pa.int64())})
+        tbl = tbl.replace_schema_metadata({'arrow_mtime_ns': str(key[1])})
+        with pa.ipc.new_file(self.index_path, tbl.schema) as writer:
+            writer.write_table(tbl)
+        self._index, self._index_key = index, key
+
+    def _load_index(self) -> Optional[Dict[Any, int]]:
+        """Return the row map for the Feather file on disk, or None if it is missing or stale."""
+        if not PYARROW_AVAILABLE:
+            return None
+        try:
+            key = (self.arrow_path, os.stat(self.arrow_path).st_mtime_ns)
+        except FileNotFoundError:
+            return None
+        if self._index_key != key:
+            self._index, self._index_key = None, key
+            try:
+                with pa.memory_map(self.index_path) as source:
+                    tbl = pa.ipc.open_file(source).read_all()
+                if (tbl.schema.metadata or {}).get(b'arrow_mtime_ns') == str(key[1]).encode():
+                    self._index = dict(zip(tbl.column('entity_id').to_pylist(),
+                                           tbl.column('row').to_pylist()))
+            except FileNotFoundError:
+                pass
+            except (OSError, KeyError, pa.ArrowInvalid) as e:
+                logger.warning("Ignoring unreadable feature index %s: %s", self.index_path, str(e))
+        return self._index
+
+    def _source_key(self):
+        """(path, mtime_ns) of the file backing the store, preferring Feather over the legacy CSV."""
+        path = self.arrow_path if PYARROW_AVAILABLE and os.path.exists(self.arrow_path) else self.csv_path
+        try:
+            return path, os.stat(path).st_mtime_ns
+        except FileNotFoundError:
+            return None
+
+    def _cached_table(self):
+        """Return the cached table if it still matches the file on disk, without loading anything."""
+        if self._cache is not None and self._cache_key == self._source_key():
+            return self._cache
+        return None
+
+    def _load(self):
+        """Return the feature table, re-reading it only when the backing file's mtime changes.
+
+        An Arrow Table when pyarrow is installed, otherwise a pandas DataFrame; None if the
+        store is empty.
+        """
+        key = self._source_key()
+        if key is None:
+            self._cache = self._cache_key = None
+            return None
+        if key != self._cache_key:
+            path = key[0]
+            if path == self.arrow_path:
+                self._cache = feather.read_table(path)
+            elif PYARROW_AVAILABLE:
+                self._cache = pacsv.read_csv(path)
+            else:
+                self._cache = pd.read_csv(path)
+            self._cache_key = key
+        return self._cache
+
     def get_features(self, entity_id: str, feature_names: List[str] = None) -> Dict[str, Any]:
         """Retrieve features for a customer entity for inference."""
         try:
-            csv_path = os.path.join(self.store_path, "churn_features.csv")
-            if os.path.exists(csv_path):
-                df = pd.read_csv(csv_path)
-                # Find the row with matching customer_id
-                customer_row = df[df['customer_id'] == entity_id]
-                if not customer_row.empty:
-                    if feature_names:
-                        result = {col: customer_row[col].iloc[0] for col in feature_names if col in customer_row.columns}
+            # With a current id index the table is loaded once and every lookup after that
+            # is a probe plus slice; the Parquet read serves stores without one
+            cold = (PYARROW_AVAILABLE and self._cached_table() is None
+                    and self._load_index() is None)
+            if cold and os.path.isdir(self.parquet_path):
+                # Cold cache: bucket + id predicates prune to one partition and row group,
+                # so a lookup never pays for decoding the whole table
+                names = pq.ParquetDataset(self.parquet_path).schema.names
+                entity_col = _entity_column(names)
+                rows = pq.read_table(
+                    self.parquet_path,
+                    columns=_select_feature_columns(names, feature_names),
+                    filters=[('entity_bucket', '=', int(_entity_buckets([entity_id])[0])),
+                             (entity_col, '=', entity_id)],
+                ).to_pylist()
+            elif cold and not os.path.exists(self.arrow_path) and os.path.exists(self.csv_path):
+                # Store written before the Arrow files existed: decode only the id and the
+                # requested columns, with pandas' multithreaded pyarrow CSV engine
+                header = pd.read_csv(self.csv_path, nrows=0).columns
+                entity_col = _entity_column(header)
+                columns = _select_feature_columns(header, feature_names)
+                df = pd.read_csv(self.csv_path, usecols=list(dict.fromkeys([entity_col] + columns)),
+                                 engine='pyarrow', dtype_backend='pyarrow')
+                rows = df.loc[df[entity_col] == entity_id, columns].head(1).to_dict('records')
+            else:
+                tbl = self._load()
+                if tbl is None:
+                    logger.warning("No feature store data found")
+                    return {}
+                if PYARROW_AVAILABLE:
+                    names = tbl.column_names
+                    index = self._load_index()
+                    if index is not None and self._index_key == self._cache_key:
+                        # One hash probe and a zero-copy one-row slice instead of scanning the id column
+                        row = index.get(entity_id)
+                        matches = tbl.slice(row, 1) if row is not None else tbl.slice(0, 0)
                     else:
-                        result = {col: customer_row[col].iloc[0] for col in customer_row.columns if col not in ['customerID', 'created_timestamp', 'updated_timestamp']}
-                    logger.debug("Retrieved features for entity %s: %s", entity_id, result)
-                    return result
+                        matches = tbl.filter(pc.equal(tbl[_entity_column(names)], entity_id))
+                    rows = matches.select(_select_feature_columns(names, feature_names)).slice(0, 1).to_pylist()
                 else:
-                    logger.warning("No features found for entity %s", entity_id)
-                    return {}
-            else:
-                logger.warning("No feature store data found")
+                    customer_row = tbl[tbl[_entity_column(tbl.columns)] == entity_id]
+                    rows = customer_row[_select_feature_columns(tbl.columns, feature_names)].head(1).to_dict('records')
+
+            if not rows:
+                logger.warning("No features found for entity %s", entity_id)
                 return {}
+            result = rows[0]
+            # Per-request path: skip the record (and the dict repr) entirely unless DEBUG is on
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug("Retrieved features for entity %s: %s", entity_id, result)
+            return result
         
         except Exception as e:
             logger.error("Failed to retrieve features for entity %s: %s", entity_id, str(e))
             return {}
 
     def get_training_dataset(self) -> pd.DataFrame:
-        """Get the complete training dataset."""
+        """Get the complete training dataset (see iter_training_batches for large stores)."""
         try:
-            csv_path = os.path.join(self.store_path, "churn_features.csv")
-            if os.path.exists(csv_path):
-                df = pd.read_csv(csv_path)
+            tbl = self._load()
+            if tbl is not None:
+                # Fresh pandas copy of the cached table; callers may mutate it
+                df = tbl.to_pandas() if PYARROW_AVAILABLE else tbl.copy()
                 logger.info("Retrieved training dataset with shape %s", df.shape)
                 return df
             else:
@@ -196,27 +511,78 @@ class SimpleChurnFeatureStore:
             logger.error("Failed to retrieve training dataset: %s", str(e))
             return pd.DataFrame()
 
+    def iter_training_batches(self, batch_size: int = 100_000, as_pandas: bool = False) -> Iterator[Any]:
+        """Yield the training dataset in batches of batch_size rows, never holding the whole store.
+
+        Yields Arrow RecordBatches read one IPC batch at a time from the Feather file (or
+        streamed from a legacy CSV), or DataFrames with as_pandas=True; without pyarrow,
+        always pandas DataFrame chunks of the CSV. Peak memory is O(batch_size), for
+        mini-batch / external-memory training.
+        """
+        if not PYARROW_AVAILABLE:
+            if os.path.exists(self.csv_path):
+                yield from pd.read_csv(self.csv_path, chunksize=batch_size)
+            return
+
+        if os.path.exists(self.arrow_path):
+            with pa.OSFile(self.arrow_path) as source:
+                reader = pa.ipc.open_file(source)
+                batches = (reader.get_batch(i) for i in range(reader.num_record_batches))
+                for batch in _rebatch(batches, target_rows=batch_size):
+                    yield batch.to_pandas() if as_pandas else batch
+        elif os.path.exists(self.csv_path):
+            reader = pacsv.open_csv(self.csv_path, read_options=pacsv.ReadOptions(block_size=CSV_BLOCK_SIZE))
+            for batch in _rebatch(reader, target_rows=batch_size):
+                yield batch.to_pandas() if as_pandas else batch
+
+    def _feature_fields(self) -> List[tuple]:
+        """(name, is_categorical) per stored column, read from the schema only - no column data.
+
+        Uses the cached table when warm, else the Feather footer. Label-encoded columns are
+        integers but still categorical, so the _encoded suffix counts alongside string,
+        dictionary and boolean types.
+        """
+        if not PYARROW_AVAILABLE:
+            if not os.path.exists(self.csv_path):
+                return []
+            return [(col, '_encoded' in col) for col in pd.read_csv(self.csv_path, nrows=0).columns]
+
+        tbl = self._cached_table()
+        if tbl is not None:
+            schema = tbl.schema
+        elif os.path.exists(self.arrow_path):
+            with pa.memory_map(self.arrow_path) as source:
+                schema = pa.ipc.open_file(source).schema
+        else:
+            tbl = self._load()
+            if tbl is None:
+                return []
+            schema = tbl.schema
+        return [
+            (field.name, '_encoded' in field.name or pa.types.is_string(field.type)
+             or pa.types.is_large_string(field.type) or pa.types.is_dictionary(field.type)
+             or pa.types.is_boolean(field.type))
+            for field in schema
+        ]
+
     def get_feature_metadata(self, output_format: str = "dataframe") -> Any:
         """Get feature metadata in DataFrame or Markdown format."""
         try:
-            csv_path = os.path.join(self.store_path, "churn_features.csv")
-            if os.path.exists(csv_path):
-                df = pd.read_csv(csv_path)
-                metadata = []
-                for col in df.columns:
-                    if col not in ['created_timestamp', 'updated_timestamp']:
-                        feature_type = 'categorical' if '_encoded' in col else 'numerical'
-                        metadata.append({
-                            "feature_name": col,
-                            "description": f"Feature: {col}",
-                            "source": "data_preparation",
-                            "version": "1.0",
-                            "data_type": feature_type,
-                            "created_date": datetime.now().isoformat(),
-                            "is_active": True
-                        })
-            else:
-                metadata = []
+            fields = self._feature_fields()
+            created_date = datetime.now().isoformat()
+            metadata = [
+                {
+                    "feature_name": col,
+                    "description": f"Feature: {col}",
+                    "source": "data_preparation",
+                    "version": "1.0",
+                    "data_type": 'categorical' if categorical else 'numerical',
+                    "created_date": created_date,
+                    "is_active": True
+                }
+                for col, categorical in fields
+                if col not in TIMESTAMP_COLUMNS
+            ]
 
             if output_format == "markdown":
                 markdown = "# Feature Metadata\n\n"
@@ -246,21 +612,42 @@ class SimpleChurnFeatureStore:
     def get_feature_summary(self) -> Dict[str, Any]:
         """Get a summary of the feature store."""
         try:
-            csv_path = os.path.join(self.store_path, "churn_features.csv")
-            if os.path.exists(csv_path):
-                df = pd.read_csv(csv_path)
-                summary = {
-                    "total_records": len(df),
-                    "total_features": len(df.columns),
-                    "feature_columns": list(df.columns),
-                    "data_types": df.dtypes.to_dict(),
-                    "missing_values": df.isnull().sum().to_dict(),
-                    "churn_distribution": df['Churn'].value_counts().to_dict() if 'Churn' in df.columns else {},
+            tbl = self._load()
+            if tbl is None:
+                return {"error": "No feature store data found"}
+
+            if not PYARROW_AVAILABLE:
+                return {
+                    "total_records": len(tbl),
+                    "total_features": len(tbl.columns),
+                    "feature_columns": list(tbl.columns),
+                    "data_types": tbl.dtypes.to_dict(),
+                    "missing_values": tbl.isnull().sum().to_dict(),
+                    "churn_distribution": tbl['Churn'].value_counts().to_dict() if 'Churn' in tbl.columns else {},
                     "last_updated": datetime.now().isoformat()
                 }
-                return summary
-            else:
-                return {"error": "No feature store data found"}
+
+            # Arrow compute kernels straight on the cached table - no pandas conversion.
+            # nan_is_null keeps parity with pandas' isnull() for float columns.
+            churn_distribution = {}
+            if 'Churn' in tbl.column_names:
+                churn_distribution = {
+                    item['values']: item['counts']
+                    for item in pc.value_counts(tbl['Churn']).to_pylist()
+                    if item['values'] is not None
+                }
+            return {
+                "total_records": tbl.num_rows,
+                "total_features": tbl.num_columns,
+                "feature_columns": tbl.column_names,
+                "data_types": {field.name: str(field.type) for field in tbl.schema},
+                "missing_values": {
+                    name: pc.sum(pc.is_null(tbl[name], nan_is_null=True)).as_py() or 0
+                    for name in tbl.column_names
+                },
+                "churn_distribution": churn_distribution,
+                "last_updated": datetime.now().isoformat()
+            }
         except Exception as e:
             logger.error("Failed to get feature summary: %s", str(e))
             return {"error": str(e)}
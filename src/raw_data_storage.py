@@ -3,16 +3,36 @@ Raw Data Storage
 ----------------
 Organizes raw files into a partitioned local structure and optionally mirrors
 the same layout in S3 when STORAGE_TYPE=cloud. Also creates a simple JSON
-catalog of stored files for discoverability.
+catalog of stored files for discoverability and, when pyarrow is installed, an
+append-only Parquet catalog under data/raw/catalog partitioned by source and
+data_type.
 """
+import json
 import os
 import shutil
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from pathlib import Path
 from dotenv import load_dotenv
 
 from utils.logger import get_logger, PIPELINE_NAMES
 
+# Optional: faster JSON encoding for the data catalog
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# Optional: queryable, append-only Parquet catalog next to the JSON one
+try:
+    import pyarrow as pa
+    import pyarrow.dataset as ds
+    import pyarrow.parquet as pq
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -21,12 +41,70 @@ logger = get_logger(PIPELINE_NAMES['RAW_DATA_STORAGE'])
 
 try:
     import boto3
+    from boto3.s3.transfer import TransferConfig, create_transfer_manager
     from botocore.exceptions import ClientError
     BOTO3_AVAILABLE = True
 except ImportError:
     BOTO3_AVAILABLE = False
     logger.warning("boto3 not available. Cloud storage will be disabled.")
 
+# Multipart above 8 MiB, up to 10 parts in flight per upload
+S3_TRANSFER_CONFIG = dict(multipart_threshold=8 * 1024 * 1024, max_concurrency=10, use_threads=True)
+
+if PYARROW_AVAILABLE:
+    CATALOG_SCHEMA = pa.schema([
+        ('file_name', pa.string()),
+        ('file_path', pa.string()),
+        ('size_bytes', pa.int64()),
+        ('created_date', pa.timestamp('us')),
+        ('source', pa.string()),
+        ('data_type', pa.string()),
+        ('date_partition', pa.string()),
+    ])
+
+
+def _partition_fields(relative_path):
+    """(source, data_type, YYYY/MM/DD) for files in the sources/ layout, placeholders otherwise."""
+    parts = relative_path.split(os.sep)
+    if len(parts) >= 7 and parts[0] == "sources":
+        return parts[1], parts[2], "/".join(parts[3:6])
+    return "unpartitioned", "unpartitioned", None
+
+
+def _walk_files(path, skip=()):
+    """Yield DirEntry objects for every non-hidden file under path (symlinks not followed)."""
+    with os.scandir(path) as it:
+        for entry in it:
+            if entry.is_dir(follow_symlinks=False):
+                if entry.path not in skip:
+                    yield from _walk_files(entry.path, skip)
+            elif entry.is_file(follow_symlinks=False) and not entry.name.startswith('.'):
+                yield entry
+
+
+def _fast_copy(source_path, destination_path):
+    """Copy with os.copy_file_range when possible, else shutil.copy2.
+
+    copy_file_range stays in the kernel and becomes a reflink (shared extents, copy on
+    write) on XFS/Btrfs. Hardlinks are deliberately not used: ingestion rewrites its
+    output files in place, which would silently change an archived link.
+    """
+    if hasattr(os, 'copy_file_range'):
+        try:
+            with open(source_path, 'rb') as src, open(destination_path, 'wb') as dst:
+                remaining = os.fstat(src.fileno()).st_size
+                while remaining > 0:
+                    copied = os.copy_file_range(src.fileno(), dst.fileno(), remaining)
+                    if copied == 0:
+                        break
+                    remaining -= copied
+            shutil.copystat(source_path, destination_path)
+            return
+        except OSError:
+            pass  # unsupported filesystem pair or kernel; copy2 below overwrites any partial file
+    shutil.copy2(source_path, destination_path)
+
+
 # Class: manages raw file layout locally and in S3
 class RawDataStorage:
     """Manage local/S3 storage of raw ingested files and metadata catalog."""
@@ -36,13 +114,16 @@ class RawDataStorage:
         self.storage_type = storage_type if storage_type is not None else (env_storage or "local")
         self.base_path = Path(base_path)
         self.s3_client = None
+        self._transfer = None
         self.bucket_name = os.environ.get('S3_BUCKET_NAME', 'churn-data-lake')
+        self.catalog_dir = self.base_path / "catalog"
+        self._catalog_paths = None  # file_path values already in the Parquet catalog
 
         if self.storage_type == "cloud" and BOTO3_AVAILABLE:
             self._init_s3_client()
 
         self.base_path.mkdir(parents=True, exist_ok=True)
-        logger.info(f"Storage initialized: type={self.storage_type}, base_path={self.base_path}")
+        logger.info("Storage initialized: type=%s, base_path=%s", self.storage_type, self.base_path)
 
     # Initialize S3 client and ensure bucket exists (if permissions allow)
     def _init_s3_client(self):
@@ -71,15 +152,18 @@ class RawDataStorage:
                         Bucket=self.bucket_name,
                         CreateBucketConfiguration={'LocationConstraint': aws_region}
                     )
-                    logger.info(f"Created S3 bucket: {self.bucket_name}")
+                    logger.info("Created S3 bucket: %s", self.bucket_name)
                 else:
                     raise
             
-            logger.info(f"S3 connected to bucket: {self.bucket_name}")
+            # One transfer manager shared by all uploads: pooled connections, concurrent multipart parts
+            self._transfer = create_transfer_manager(self.s3_client, TransferConfig(**S3_TRANSFER_CONFIG))
+            logger.info("S3 connected to bucket: %s", self.bucket_name)
         
         except Exception as e:
-            logger.error(f"S3 initialization failed: {str(e)}")
+            logger.error("S3 initialization failed: %s", str(e))
             self.s3_client = None
+            self._transfer = None
 
     # Copy file into partitioned layout and optionally upload to S3
     def store_file(self, source_path, source, data_type="churn"):
@@ -98,21 +182,21 @@ class RawDataStorage:
         destination_path = destination_dir / filename
 
         # Copy to local
-        shutil.copy2(source_path, destination_path)
-        logger.info(f"File stored locally: {destination_path}")
+        _fast_copy(source_path, destination_path)
+        logger.info("File stored locally: %s", destination_path)
 
         # Upload to cloud if enabled
         s3_url = None
-        if self.storage_type == "cloud" and self.s3_client:
+        if self.storage_type == "cloud" and self._transfer:
             # S3 key mirrors local relative path
             relative_path = destination_path.relative_to(self.base_path)
             s3_key = str(relative_path).replace("\\", "/")
             try:
-                self.s3_client.upload_file(str(destination_path), self.bucket_name, s3_key)
+                self._transfer.upload(str(destination_path), self.bucket_name, s3_key).result()
                 s3_url = f"s3://{self.bucket_name}/{s3_key}"
-                logger.info(f"Uploaded to S3: {s3_url}")
+                logger.info("Uploaded to S3: %s", s3_url)
             except Exception as e:
-                logger.error(f"S3 upload failed: {str(e)}")
+                logger.error("S3 upload failed: %s", str(e))
 
         return {"local_path": str(destination_path), "s3_url": s3_url}
 
@@ -120,57 +204,98 @@ class RawDataStorage:
     def store_ingested_files(self, ingestion_result):
         """Store files from DataIngestionPipeline.run_ingestion"""
         try:
-            results = []
-            # Store CSV file
-            if 'csv_file' in ingestion_result and ingestion_result['csv_file']:
-                result = self.store_file(
-                    source_path=ingestion_result['csv_file'],
-                    source='telco_csv',
-                    data_type='churn'
+            # (path, source name, log label) for each file the ingestion step produced
+            jobs = [
+                (ingestion_result[key], source, label)
+                for key, source, label in (
+                    ('csv_file', 'telco_csv', 'CSV'),
+                    ('huggingface_file', 'huggingface', 'Hugging Face'),
                 )
-                results.append(result)
-                logger.info(f"Stored CSV file from ingestion: {result['local_path']}")
-
-            # Store Hugging Face JSON file
-            if 'huggingface_file' in ingestion_result and ingestion_result['huggingface_file']:
-                result = self.store_file(
-                    source_path=ingestion_result['huggingface_file'],
-                    source='huggingface',
-                    data_type='churn'
-                )
-                results.append(result)
-                logger.info(f"Stored Hugging Face file from ingestion: {result['local_path']}")
+                if ingestion_result.get(key)
+            ]
+            if not jobs:
+                return []
+
+            # Copies and uploads are I/O-bound; run them side by side instead of back to back
+            with ThreadPoolExecutor(max_workers=len(jobs)) as executor:
+                futures = [
+                    executor.submit(self.store_file, source_path=path, source=source, data_type='churn')
+                    for path, source, _ in jobs
+                ]
+                results = []
+                for future, (_, _, label) in zip(futures, jobs):
+                    result = future.result()
+                    results.append(result)
+                    logger.info("Stored %s file from ingestion: %s", label, result['local_path'])
 
             return results
 
         except Exception as e:
-            logger.error(f"Failed to store ingested files: {str(e)}")
+            logger.error("Failed to store ingested files: %s", str(e))
             raise
 
-    # Walk storage and emit a JSON catalog of files
+    def _catalog_known_paths(self):
+        """Return the set of file paths already in the Parquet catalog (read once per instance)."""
+        if self._catalog_paths is None:
+            self._catalog_paths = set()
+            if self.catalog_dir.exists():
+                dataset = ds.dataset(str(self.catalog_dir), format='parquet', partitioning='hive')
+                self._catalog_paths.update(dataset.to_table(columns=['file_path']).column('file_path').to_pylist())
+        return self._catalog_paths
+
+    def _append_catalog(self, rows):
+        """Append rows to the Parquet catalog, hive-partitioned by source and data_type."""
+        tbl = pa.Table.from_pylist(rows, schema=CATALOG_SCHEMA)
+        pq.write_to_dataset(tbl, root_path=str(self.catalog_dir), partition_cols=['source', 'data_type'])
+        self._catalog_paths.update(row['file_path'] for row in rows)
+        logger.info("Appended %d new files to Parquet catalog: %s", len(rows), self.catalog_dir)
+
+    # Walk storage and emit a JSON catalog of files (plus new rows for the Parquet catalog)
     def create_data_catalog(self):
         """Create metadata catalog for stored data"""
         catalog = {
             'datasets': [],
-            'last_updated': datetime.now().isoformat()
+            'last_updated': datetime.now()
         }
 
-        for file_path in self.base_path.rglob("*"):
-            if file_path.is_file() and not file_path.name.startswith('.'):
-                file_info = {
-                    'file_name': file_path.name,
-                    'file_path': str(file_path),
-                    'size_bytes': file_path.stat().st_size,
-                    'created_date': datetime.fromtimestamp(file_path.stat().st_ctime).isoformat()
-                }
-                catalog['datasets'].append(file_info)
+        # DirEntry.stat() is cached per entry: one stat per file, no Path objects
+        new_rows = []
+        known_paths = self._catalog_known_paths() if PYARROW_AVAILABLE else set()
+        for entry in _walk_files(self.base_path, skip={str(self.catalog_dir)}):
+            st = entry.stat(follow_symlinks=False)
+            created = datetime.fromtimestamp(st.st_ctime)
+            catalog['datasets'].append({
+                'file_name': entry.name,
+                'file_path': entry.path,
+                'size_bytes': st.st_size,
+                'created_date': created
+            })
+            if PYARROW_AVAILABLE and entry.path not in known_paths:
+                source, data_type, date_partition = _partition_fields(os.path.relpath(entry.path, self.base_path))
+                new_rows.append({
+                    'file_name': entry.name,
+                    'file_path': entry.path,
+                    'size_bytes': st.st_size,
+                    'created_date': created,
+                    'source': source,
+                    'data_type': data_type,
+                    'date_partition': date_partition,
+                })
+
+        if new_rows:
+            self._append_catalog(new_rows)
 
+        # datetimes stay raw: orjson encodes them natively (same text as isoformat()), the
+        # stdlib fallback converts them only at dump time
         catalog_path = self.base_path / 'data_catalog.json'
-        import json
-        with open(catalog_path, 'w') as f:
-            json.dump(catalog, f, indent=2)
+        if ORJSON_AVAILABLE:
+            with open(catalog_path, 'wb') as f:
+                f.write(orjson.dumps(catalog, option=orjson.OPT_INDENT_2))
+        else:
+            with open(catalog_path, 'w') as f:
+                json.dump(catalog, f, indent=2, default=datetime.isoformat)
 
-        logger.info(f"Data catalog created: {catalog_path}")
+        logger.info("Data catalog created: %s", catalog_path)
         return str(catalog_path)
 
 if __name__ == "__main__":
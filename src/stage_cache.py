@@ -0,0 +1,140 @@
+"""
+Stage Cache
+-----------
+Content-addressed cache for pipeline stage results. A stage's cache key hashes
+the bytes of its input files, the source of the module implementing it (plus
+every local src/ module it imports) and any parameters, so a scheduled re-run
+over byte-identical inputs with unchanged code can be skipped.
+
+Results are stored as JSON under data/.stage_cache/<key>.json together with the
+paths the stage wrote; an entry whose outputs have since been deleted is a miss.
+"""
+import ast
+import hashlib
+import json
+import os
+from typing import Any, Dict, Iterable, List, Optional
+
+from utils.logger import get_logger, PIPELINE_NAMES
+
+# Get logger for this pipeline
+logger = get_logger(PIPELINE_NAMES['STAGE_CACHE'])
+
+# Read size used when hashing input files
+_HASH_CHUNK_SIZE = 1 << 20
+
+
+def _local_source(src_dir: str, dotted_name: str) -> Optional[str]:
+    """Source file of a dotted module name under src_dir, or None if it is not local."""
+    base = os.path.join(src_dir, *dotted_name.split('.'))
+    for candidate in (f"{base}.py", os.path.join(base, '__init__.py')):
+        if os.path.isfile(candidate):
+            return candidate
+    return None
+
+
+def local_module_files(module_name: str, src_dir: str) -> List[str]:
+    """
+    Source files of module_name and of every module under src_dir it imports,
+    followed transitively. Third-party and stdlib imports are skipped.
+    """
+    pending = [_local_source(src_dir, module_name)]
+    if pending[0] is None:
+        raise FileNotFoundError(f"Module {module_name} not found in {src_dir}")
+    seen = set()
+    while pending:
+        path = pending.pop()
+        if path in seen:
+            continue
+        seen.add(path)
+        with open(path, 'rb') as f:
+            tree = ast.parse(f.read(), filename=path)
+        names = []
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                names.extend(alias.name for alias in node.names)
+            elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+                names.append(node.module)
+                # "from utils import logger" imports the submodule utils/logger.py
+                names.extend(f"{node.module}.{alias.name}" for alias in node.names)
+        for name in names:
+            parts = name.split('.')
+            # Every package on the dotted path runs its __init__ on import
+            for depth in range(1, len(parts) + 1):
+                source = _local_source(src_dir, '.'.join(parts[:depth]))
+                if source and source not in seen:
+                    pending.append(source)
+    return sorted(seen)
+
+
+class StageCache:
+    """Disk-backed store of stage results keyed by input and code hashes."""
+
+    def __init__(self, cache_dir="data/.stage_cache"):
+        self.cache_dir = cache_dir
+        os.makedirs(cache_dir, exist_ok=True)
+
+    def make_key(self, stage_name: str, input_files: Iterable[str],
+                 module_files: Iterable[str] = (),
+                 params: Optional[Dict[str, Any]] = None) -> str:
+        """Build sha256(stage + input bytes + module sources + params).
+
+        Each file is framed by its relative path and size, so bytes moving from
+        one file to the next (or a renamed input) change the key.
+        """
+        digest = hashlib.sha256(stage_name.encode('utf-8'))
+        for path in [*input_files, *module_files]:
+            with open(path, 'rb') as f:
+                size = os.fstat(f.fileno()).st_size
+                digest.update(f"\0{os.path.relpath(path)}\0{size}\0".encode('utf-8'))
+                for chunk in iter(lambda: f.read(_HASH_CHUNK_SIZE), b''):
+                    digest.update(chunk)
+        if params:
+            digest.update(json.dumps(params, sort_keys=True, default=str).encode('utf-8'))
+        return digest.hexdigest()
+
+    def _entry_path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _read_entry(self, key: str) -> Optional[Dict[str, Any]]:
+        try:
+            with open(self._entry_path(key), 'r') as f:
+                entry = json.load(f)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError) as e:
+            logger.warning("Ignoring unreadable stage cache entry %s: %s", key, str(e))
+            return None
+        # Entries written before outputs were recorded cannot be checked; treat as a miss
+        if not isinstance(entry, dict) or 'outputs' not in entry:
+            return None
+        return entry
+
+    def has(self, key: str) -> bool:
+        """Check whether a result is stored for key and every output it recorded still exists."""
+        entry = self._read_entry(key)
+        if entry is None:
+            return False
+        missing = [path for path in entry['outputs'] if not os.path.exists(path)]
+        if missing:
+            logger.info("Stage cache entry %s is stale, outputs missing: %s",
+                        key, ", ".join(missing))
+            return False
+        return True
+
+    def load(self, key: str) -> Any:
+        """Load the stored result for key."""
+        result = self._read_entry(key)['result']
+        logger.info("Stage cache hit: %s", key)
+        return result
+
+    def store(self, key: str, result: Any, outputs: Iterable[str] = ()) -> str:
+        """Store a JSON-serializable result for key, with the output paths the stage wrote."""
+        entry_path = self._entry_path(key)
+        tmp_path = f"{entry_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'result': result, 'outputs': list(outputs)}, f, default=str)
+        # Atomic rename so a crashed task never leaves a partial entry behind
+        os.replace(tmp_path, entry_path)
+        logger.info("Stage result cached: %s", key)
+        return entry_path
@@ -6,15 +6,30 @@ A unified logging system for all pipelines to ensure consistency
 and reduce code duplication.
 """
 
+import atexit
 import logging
 import os
+import queue
+import threading
+from logging.handlers import QueueHandler, QueueListener
 from typing import Optional
 
 
+# Shared by every handler; formatters are stateless, so one instance is enough
+_FORMATTER = logging.Formatter(
+    '%(asctime)s - %(levelname)s - %(message)s',
+    datefmt='%Y-%m-%d %H:%M:%S'
+)
+
+
 class PipelineLogger:
     """Centralized logger for all pipelines"""
     
     _loggers = {}  # Cache for loggers to prevent duplicates
+    _listeners = {}  # Background QueueListener per pipeline, doing that pipeline's console I/O
+    _queue_handlers = {}  # QueueHandler per pipeline, feeding that pipeline's listener
+    _listeners_running = False
+    _lock = threading.Lock()  # Taken only on a cache miss
     
     @classmethod
     def get_logger(cls, pipeline_name: str, log_file: Optional[str] = None) -> logging.Logger:
@@ -28,11 +43,20 @@ class PipelineLogger:
         Returns:
             Configured logger instance
         """
-        # Return cached logger if it exists
-        if pipeline_name in cls._loggers:
-            return cls._loggers[pipeline_name]
+        # Return cached logger if it exists (lock-free: no syscalls or handler work on a hit)
+        logger = cls._loggers.get(pipeline_name)
+        if logger is not None:
+            return logger
         
-        # Create new logger
+        with cls._lock:
+            # Double-checked: another thread may have built it while we waited
+            if pipeline_name not in cls._loggers:
+                cls._loggers[pipeline_name] = cls._build_logger(pipeline_name, log_file)
+            return cls._loggers[pipeline_name]
+
+    @classmethod
+    def _build_logger(cls, pipeline_name: str, log_file: Optional[str]) -> logging.Logger:
+        """Create and wire up a pipeline logger; called with _lock held."""
         if log_file is None:
             log_file = f'logs/{pipeline_name}.log'
         
@@ -45,27 +69,80 @@ class PipelineLogger:
         
         # Prevent duplicate handlers
         if not logger.handlers:
-            # Create formatter
-            formatter = logging.Formatter(
-                '%(asctime)s - %(levelname)s - %(message)s',
-                datefmt='%Y-%m-%d %H:%M:%S'
-            )
-            
             # File handler
             file_handler = logging.FileHandler(log_file)
-            file_handler.setFormatter(formatter)
-            logger.addHandler(file_handler)
+            file_handler.setFormatter(_FORMATTER)
             
             # Console handler
             console_handler = logging.StreamHandler()
-            console_handler.setFormatter(formatter)
-            logger.addHandler(console_handler)
-        
-        # Cache the logger
-        cls._loggers[pipeline_name] = logger
+            console_handler.setFormatter(_FORMATTER)
+            
+            # The file is written synchronously, so a record is on disk even if the
+            # process leaves through os._exit or forks mid-run. Console output runs
+            # on a listener thread; a log call only enqueues the record for it
+            logger.addHandler(file_handler)
+            log_queue = queue.SimpleQueue()
+            listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+            queue_handler = QueueHandler(log_queue)
+            cls._listeners[pipeline_name] = listener
+            cls._queue_handlers[pipeline_name] = queue_handler
+            if cls._listeners_running:
+                listener.start()
+            else:
+                cls.start_listeners()
+            logger.addHandler(queue_handler)
         
         return logger
 
+    @classmethod
+    def start_listeners(cls):
+        """Start a background thread per pipeline listener."""
+        if not cls._listeners_running:
+            for listener in cls._listeners.values():
+                listener.start()
+            cls._listeners_running = True
+
+    @classmethod
+    def stop_listeners(cls):
+        """Drain the queues and stop the listener threads; registered with atexit so no record is lost."""
+        if cls._listeners_running:
+            for listener in cls._listeners.values():
+                listener.stop()
+            cls._listeners_running = False
+
+    @classmethod
+    def flush_listeners(cls):
+        """
+        Write out every queued record now and keep logging afterwards.
+
+        atexit does not run when a process leaves through os._exit (as Airflow
+        task runners do), so callers flush the console explicitly when a unit
+        of work ends.
+        """
+        if cls._listeners_running:
+            cls.stop_listeners()
+            cls.start_listeners()
+
+    @classmethod
+    def _after_fork_in_child(cls):
+        # Listener threads do not survive fork(). Give the child fresh queues and
+        # listeners; records queued before the fork stay with the parent, which
+        # writes them, so nothing is duplicated and the parent never blocks
+        cls._lock = threading.Lock()
+        for pipeline_name, old_listener in cls._listeners.items():
+            log_queue = queue.SimpleQueue()
+            cls._listeners[pipeline_name] = QueueListener(
+                log_queue, *old_listener.handlers, respect_handler_level=True)
+            cls._queue_handlers[pipeline_name].queue = log_queue
+        if cls._listeners_running:
+            cls._listeners_running = False
+            cls.start_listeners()
+
+
+atexit.register(PipelineLogger.stop_listeners)
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=PipelineLogger._after_fork_in_child)
+
 
 def get_logger(pipeline_name: str, log_file: Optional[str] = None) -> logging.Logger:
     """
@@ -81,6 +158,11 @@ def get_logger(pipeline_name: str, log_file: Optional[str] = None) -> logging.Lo
     return PipelineLogger.get_logger(pipeline_name, log_file)
 
 
+def flush_logs() -> None:
+    """Write out all queued log records; call before a process may exit without atexit."""
+    PipelineLogger.flush_listeners()
+
+
 # Common pipeline names for consistency
 PIPELINE_NAMES = {
     'DATA_INGESTION': 'data_ingestion',
@@ -90,5 +172,6 @@ PIPELINE_NAMES = {
     'FEATURE_STORE': 'feature_store',
     'RAW_DATA_STORAGE': 'raw_data_storage',
     'DATA_VERSIONING': 'data_versioning',
-    'BUILD_MODEL': 'build_model'
+    'BUILD_MODEL': 'build_model',
+    'STAGE_CACHE': 'stage_cache'
 }